@@ -1,22 +1,55 @@
 import asyncio
+import math
 import random
 import logging
-import pickle
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
-from functools import lru_cache
-from datetime import datetime, timedelta
+import time
+from collections import deque
+from typing import ClassVar, Deque, Dict, List, Optional, Set, Tuple
+from dataclasses import dataclass, replace
+from datetime import datetime
 from pathlib import Path
 
+import numpy as np
+from solders.keypair import Keypair
+
 from ..data_acquisition.realtime_prices import PriceFetcher
-from ..strategy.momentum_scalping import MomentumScalper
+from ..strategy.momentum_scalping import MomentumScalper, TokenSignals
 from ..strategy.risk_management import RiskManager
 from ..execution.jup_swap import JupiterSwap
 from ..ml_signals.surge_detection import SurgeDetector
 from ..data_acquisition.social_scraper import SocialScraper
 from ..utils.logger import logger
 from ..utils.config import config
-from ..utils.helpers import is_valid_solana_address, async_retry_with_backoff
+from ..utils.helpers import is_valid_solana_address, async_retry_with_backoff, close_http_session, close_rpc_client, njit, tweet_query
+
+
+@njit(cache=True)
+def _choose_action_index(q_values: np.ndarray, epsilon: float, draw: float) -> int:
+    """Epsilon-greedy selection over the Q-values of a single state.
+
+    `draw` is a uniform sample in [0, 1). When it falls below epsilon it is rescaled to
+    pick the random action, so a single draw serves both decisions.
+    """
+    if draw < epsilon:
+        return int(draw / epsilon * q_values.shape[0])
+    return int(np.argmax(q_values))
+
+
+@njit(cache=True)
+def _q_update(q_values: np.ndarray, next_q_values: np.ndarray, action_index: int,
+              reward: float, learning_rate: float, discount_factor: float) -> None:
+    """Apply one in-place Bellman update to the Q-values of a single state."""
+    best_next = next_q_values[0]
+    for i in range(1, next_q_values.shape[0]):
+        if next_q_values[i] > best_next:
+            best_next = next_q_values[i]
+    td_error = reward + discount_factor * best_next - q_values[action_index]
+    q_values[action_index] += learning_rate * td_error
+
+
+def _bucket(value: float, low: int, high: int) -> int:
+    """Round a scaled value into the [low, high] range and shift it to a zero-based bucket index."""
+    return min(max(int(round(value)), low), high) - low
 
 
 @dataclass
@@ -28,9 +61,36 @@ class State:
     volatility: float  # Added volatility for dynamic position sizing
     time_since_last_trade: float  # Time since the last trade in seconds
 
-    def to_tuple(self) -> Tuple[float, float, float, float, float]:
-        """Convert state to tuple for use as dictionary key."""
-        return (self.price_change, self.sentiment_score, self.volume, self.volatility, self.time_since_last_trade)
+    # Number of buckets per dimension produced by to_tuple(); must match the ranges used there
+    BUCKET_COUNTS: ClassVar[Tuple[int, int, int, int, int]] = (21, 11, 25, 11, 13)
+
+    def to_tuple(self) -> Tuple[int, int, int, int, int]:
+        """Discretize state into bucket indices for use as a Q-table index.
+
+        Continuous values almost never repeat, so raw floats would make every state novel
+        and grow the Q-table without bound. Each dimension is mapped to a small fixed range.
+        """
+        return (
+            _bucket(self.price_change * 20, -10, 10),  # 5% steps, clipped to +/-50%
+            _bucket(self.sentiment_score * 10, 0, 10),  # 0.1 steps
+            _bucket(math.log1p(self.volume), 0, 24),  # Order of magnitude of 24h volume
+            _bucket(self.volatility * 10, 0, 10),  # 0.1 steps
+            _bucket(math.log1p(self.time_since_last_trade), 0, 12),  # Log-seconds, up to ~2 days
+        )
+
+
+@dataclass
+class Position:
+    """An open position in a token."""
+    __slots__ = ("entry_price", "token_amount", "entry_time", "stop_loss_price", "inv_entry_price")
+
+    entry_price: float  # USD price at which the position was opened
+    token_amount: float  # Amount held in the token's base units / 1e9, the scale JupiterSwap.swap takes (not UI token units)
+    entry_time: datetime
+    stop_loss_price: float  # Fixed at entry since it only depends on the entry price
+
+    def __post_init__(self):
+        self.inv_entry_price = 1.0 / self.entry_price if self.entry_price else 0.0  # Lets per-tick returns multiply instead of divide
 
 
 class TradingBot:
@@ -38,129 +98,148 @@ class TradingBot:
     and surge detection to optimize token trading decisions."""
 
     # Constants and configuration parameters
-    SOL_ADDRESS = "So1111111111111111111111111111111111111112"
+    SOL_ADDRESS = JupiterSwap.SOL_MINT  # Wrapped SOL mint
     ACTIONS = ['buy', 'sell', 'hold']
+    ACTION_INDEX = {action: i for i, action in enumerate(ACTIONS)}
     MIN_EPSILON = 0.01
-    MAX_Q_TABLE_SIZE = 10000  # Prevent memory bloat in Q-table
-    CACHE_TTL = 60  # Price data cache time-to-live in seconds
-    API_CALL_INTERVAL = 1  # Rate limit: 1 API call per second
+    CACHE_TTL = 60  # Seconds between tweet scrapes for a token's live sentiment score
     PARTIAL_SELL_PERCENTAGE = 0.25  # Percentage to sell gradually during a surge
     DYNAMIC_POSITION_SCALING = True  # Enable dynamic position sizing based on volatility
-    Q_TABLE_FILE = "q_table.pkl"  # File to persist Q-table
+    Q_TABLE_FILE = "q_table.npy"  # File to persist Q-table
+    Q_TABLE_SHAPE = State.BUCKET_COUNTS + (len(ACTIONS),)  # ~10 MB of float32
+    MAX_LOOP_BACKOFF = 300  # Upper bound in seconds on the delay after consecutive failed ticks
+    TOKEN_TIMEOUT_FRACTION = 0.8  # Share of the sleep interval one token's evaluation may take before it is abandoned for the tick
+    VOLATILITY_WINDOW = 60  # Price returns per rolling volatility estimate (minute candles in replay, ticks live)
+    REPLAY_CANDLE_SECONDS = 60  # Spacing of the price history candles replayed during training
+    RANDOM_BLOCK_SIZE = 1024  # Uniform draws generated per refill of the exploration stream
 
     def __init__(self):
         """Initialize the trading bot and all integrated components."""
         self.price_fetcher = PriceFetcher()
-        self.momentum_scalper = MomentumScalper()
+        self.social_scraper = SocialScraper()
+        self.momentum_scalper = MomentumScalper(self.price_fetcher, self.social_scraper)
         self.risk_manager = RiskManager()
         self.jupiter_swap = JupiterSwap()
-        self.surge_detector = SurgeDetector()  # For detecting potential explosive growth
-        self.social_scraper = SocialScraper()
+        # For detecting potential explosive growth
+        self.surge_detector = SurgeDetector(price_fetcher=self.price_fetcher, social_scraper=self.social_scraper)
         self.config = config
 
         # Wallet and positions setup
         self.wallet_address = self._initialize_wallet()
-        self.active_positions: Dict[str, float] = {}  # token_address -> entry_price
+        self.tokens: List[str] = []  # Validated token addresses being traded
+        self.active_positions: Dict[str, Position] = {}  # token_address -> open position
         self.hold_mode: Dict[str, bool] = {}  # token_address -> surge hold flag
-        self.last_trade_time: Dict[str, datetime] = {}  # token_address -> last trade time
+        self.last_trade_time: Dict[str, float] = {}  # token_address -> monotonic time of the last trade
 
         # Reinforcement Learning setup
-        self.q_table: Dict[Tuple, Dict[str, float]] = self._load_q_table()
+        self.q_table: np.ndarray = self._load_q_table()  # Indexed by state.to_tuple(), last axis is action
         self.learning_rate = 0.1
         self.discount_factor = 0.9
         self.epsilon = 1.0  # Exploration rate
         self.epsilon_decay_rate = 0.001
         self.q_table_lock = asyncio.Lock()  # Lock for concurrent Q-table updates
+        self._rng = np.random.default_rng()
+        self._random_draws = self._rng.random(self.RANDOM_BLOCK_SIZE)
+        self._random_pos = 0
 
-        # Rate limiting and caching for price data
-        self.last_api_call_time = datetime.now()
-        self.price_cache: Dict[str, Tuple[Dict, datetime]] = {}  # token_address -> (price_data, timestamp)
+        # Price history and sentiment refresh bookkeeping; price data itself is cached by the PriceFetcher
+        self.recent_prices: Dict[str, Deque[float]] = {}  # token_address -> last VOLATILITY_WINDOW + 1 prices, oldest first
+        self.sentiment_refresh_time: Dict[str, float] = {}  # token_address -> monotonic time tweets were last queued for scoring
+        self._base_position_size: Optional[float] = None  # Risk-manager position size, reused within a tick
 
     def _initialize_wallet(self) -> str:
         """Initialize and validate wallet from private key."""
         try:
-            from solders.keypair import Keypair
             wallet_keypair = Keypair.from_base58_string(self.config.WALLET_PRIVATE_KEY)
             wallet_address = str(wallet_keypair.pubkey())
             if not is_valid_solana_address(wallet_address):
                 logger.error("Wallet address is invalid. Please check your private key.")
                 return ""
             return wallet_address
-        except ImportError:
-            logger.error("Failed to import solders.keypair. Make sure it's installed.")
         except Exception as e:
             logger.error(f"Private key is invalid or missing: {e}")
         return ""
 
-    def _load_q_table(self) -> Dict[Tuple, Dict[str, float]]:
+    def _load_q_table(self) -> np.ndarray:
         """Load Q-table from a file if it exists."""
         if Path(self.Q_TABLE_FILE).exists():
             try:
-                with open(self.Q_TABLE_FILE, "rb") as f:
-                    return pickle.load(f)
+                q_table = np.load(self.Q_TABLE_FILE)
+                if q_table.shape == self.Q_TABLE_SHAPE:
+                    return q_table.astype(np.float32, copy=False)
+                logger.warning(f"Ignoring Q-table with shape {q_table.shape}, expected {self.Q_TABLE_SHAPE}.")
             except Exception as e:
                 logger.error(f"Failed to load Q-table: {e}")
-        return {}
+        return np.zeros(self.Q_TABLE_SHAPE, dtype=np.float32)
 
     async def _save_q_table(self) -> None:
         """Save Q-table to a file."""
         async with self.q_table_lock:
             try:
-                with open(self.Q_TABLE_FILE, "wb") as f:
-                    pickle.dump(self.q_table, f)
+                np.save(self.Q_TABLE_FILE, self.q_table)
             except Exception as e:
                 logger.error(f"Failed to save Q-table: {e}")
 
-    @async_retry_with_backoff(retries=3, backoff_in_seconds=2)
-    async def _fetch_price_data_batch(self, token_addresses: List[str]) -> Dict[str, Dict]:
-        """Fetch price data for multiple tokens using batch requests."""
-        # Rate limiting
-        time_since_last_call = datetime.now() - self.last_api_call_time
-        if time_since_last_call < timedelta(seconds=self.API_CALL_INTERVAL):
-            await asyncio.sleep((timedelta(seconds=self.API_CALL_INTERVAL) - time_since_last_call).total_seconds())
-        self.last_api_call_time = datetime.now()
-
-        try:
-            price_data = await self.price_fetcher.get_prices_dexscreener_batch(token_addresses)
-            return price_data
-        except Exception as e:
-            logger.error(f"Error fetching batch price data: {e}")
-            return {}
-
-    @lru_cache(maxsize=128)
-    async def _fetch_price_data(self, token_address: str) -> Optional[Dict]:
-        """Fetch and cache price data for a single token."""
-        if token_address in self.price_cache:
-            price_data, timestamp = self.price_cache[token_address]
-            if datetime.now() - timestamp < timedelta(seconds=self.CACHE_TTL):
-                return price_data
-
-        price_data = await self._fetch_price_data_batch([token_address])
-        if token_address in price_data:
-            self.price_cache[token_address] = (price_data[token_address], datetime.now())
-            return price_data[token_address]
-        return None
-
-    async def get_state(self, token_address: str) -> Optional[State]:
-        """Collect current market state information for a given token."""
-        price_data = await self._fetch_price_data(token_address)
+    async def _refresh_price_cache(self, token_addresses: List[str]) -> None:
+        """Prime the price cache for all tokens with a single batched fetch per tick."""
+        price_data = await self.price_fetcher.get_prices_dexscreener_batch(token_addresses)
+        for token_address, data in price_data.items():
+            self._record_price(token_address, data['price_usd'])
+
+    def _record_price(self, token_address: str, price: float) -> None:
+        """Append a price sample to the token's rolling window used for volatility."""
+        prices = self.recent_prices.get(token_address)
+        if prices is None:
+            prices = self.recent_prices[token_address] = deque(maxlen=self.VOLATILITY_WINDOW + 1)
+        prices.append(price)
+
+    def _volatility(self, token_address: str) -> float:
+        """Standard deviation of the token's recent price returns, or 0.0 until there are enough samples."""
+        prices = self.recent_prices.get(token_address)
+        if not prices or len(prices) < 3:
+            return 0.0
+        samples = np.fromiter(prices, dtype=np.float64, count=len(prices))
+        return float((np.diff(samples) / samples[:-1]).std())
+
+    async def _get_sentiment_score(self, token_address: str, token_symbol: str) -> float:
+        """Return the latest sentiment score for a token, for live training's once-a-second states.
+
+        Fresh tweets are scraped and queued for scoring at most once per CACHE_TTL seconds.
+        Model inference runs on the scraper's worker thread, so this never blocks on it and
+        returns the last completed score (0.0 until the first one is ready).
+        """
+        now = time.monotonic()
+        last_refresh = self.sentiment_refresh_time.get(token_address)
+        if last_refresh is None or now - last_refresh >= self.CACHE_TTL:
+            self.sentiment_refresh_time[token_address] = now
+            social_data = await self.social_scraper.scrape_twitter(tweet_query(token_symbol, token_address), num_tweets=50)
+            self.social_scraper.submit_sentiment(token_address, social_data)
+        return self.social_scraper.get_cached_sentiment(token_address)
+
+    async def get_state(self, token_address: str) -> Tuple[Optional[State], Optional[Dict]]:
+        """Collect current market state information for a given token.
+
+        Returns the state together with the price data it was built from, so callers
+        that also need the price don't have to look it up again.
+        """
+        price_data = await self.price_fetcher.get_price_dexscreener(token_address)
         if not price_data:
-            return None
+            return None, None
 
-        current_price = price_data['price_usd']
-        entry_price = self.active_positions.get(token_address, current_price)
-        price_change = ((current_price - entry_price) / entry_price) if token_address in self.active_positions else 0
+        sentiment_score = await self._get_sentiment_score(token_address, price_data['base_token_symbol'])
+        return self._build_state(token_address, price_data, sentiment_score), price_data
 
-        token_symbol = price_data['base_token_symbol']
-        social_data = await self.social_scraper.scrape_twitter(token_symbol, num_tweets=50)
-        sentiment_score = self.social_scraper.get_overall_sentiment(social_data) if social_data else 0
+    def _build_state(self, token_address: str, price_data: Dict, sentiment_score: float) -> State:
+        """Build a token's state from its price data and an already computed sentiment score."""
+        position = self.active_positions.get(token_address)
+        price_change = (price_data['price_usd'] - position.entry_price) * position.inv_entry_price if position else 0.0
 
-        # Calculate volatility (standard deviation of price changes over a short period)
-        volatility = await self.price_fetcher.calculate_volatility(token_address)
+        # Volatility (standard deviation of price changes over the recent window)
+        volatility = self._volatility(token_address)
 
         # Calculate time since last trade
-        last_trade_time = self.last_trade_time.get(token_address, datetime.now())
-        time_since_last_trade = (datetime.now() - last_trade_time).total_seconds()
+        last_trade_time = self.last_trade_time.get(token_address)
+        time_since_last_trade = time.monotonic() - last_trade_time if last_trade_time is not None else 0.0
 
         return State(
             price_change=price_change,
@@ -170,6 +249,15 @@ class TradingBot:
             time_since_last_trade=time_since_last_trade
         )
 
+    def _next_random(self) -> float:
+        """Return the next uniform draw from the pre-generated block, refilling it when exhausted."""
+        if self._random_pos >= self.RANDOM_BLOCK_SIZE:
+            self._random_draws = self._rng.random(self.RANDOM_BLOCK_SIZE)
+            self._random_pos = 0
+        draw = self._random_draws[self._random_pos]
+        self._random_pos += 1
+        return draw
+
     async def choose_action(self, state: Optional[State]) -> str:
         """Select an action (buy, sell, or hold) based on the current state using Q-learning."""
         if not state:
@@ -177,13 +265,9 @@ class TradingBot:
 
         state_tuple = state.to_tuple()
         async with self.q_table_lock:
-            if state_tuple not in self.q_table:
-                self.q_table[state_tuple] = {action: 0 for action in self.ACTIONS}
-
             # Exploration vs. Exploitation decision
-            if random.uniform(0, 1) < self.epsilon:
-                return random.choice(self.ACTIONS)
-            return max(self.q_table[state_tuple], key=self.q_table[state_tuple].get)
+            action_index = _choose_action_index(self.q_table[state_tuple], self.epsilon, self._next_random())
+            return self.ACTIONS[action_index]
 
     async def update_q_value(self, state: State, action: str, reward: float, next_state: State) -> None:
         """Update Q-table values based on observed rewards and the transition to the next state."""
@@ -193,21 +277,16 @@ class TradingBot:
         state_tuple = state.to_tuple()
         next_state_tuple = next_state.to_tuple()
 
+        action_index = self.ACTION_INDEX[action]
         async with self.q_table_lock:
-            if state_tuple not in self.q_table:
-                self.q_table[state_tuple] = {action: 0 for action in self.ACTIONS}
-            if next_state_tuple not in self.q_table:
-                self.q_table[next_state_tuple] = {action: 0 for action in self.ACTIONS}
-
-            best_next_action = max(self.q_table[next_state_tuple], key=self.q_table[next_state_tuple].get)
-            td_target = reward + self.discount_factor * self.q_table[next_state_tuple][best_next_action]
-            td_error = td_target - self.q_table[state_tuple][action]
-            self.q_table[state_tuple][action] += self.learning_rate * td_error
-
-            # Maintain Q-table size
-            if len(self.q_table) > self.MAX_Q_TABLE_SIZE:
-                oldest_state = next(iter(self.q_table))
-                del self.q_table[oldest_state]
+            _q_update(
+                self.q_table[state_tuple],
+                self.q_table[next_state_tuple],
+                action_index,
+                reward,
+                self.learning_rate,
+                self.discount_factor,
+            )
 
     async def reward_function(self, initial_price: float, final_price: float, action: str) -> float:
         """Define reward based on profit percentage and the action taken."""
@@ -218,154 +297,375 @@ class TradingBot:
             return -profit_percentage / 10
         return profit_percentage / 20
 
-    async def train(self, token_address: str, episodes: int = 1000) -> None:
-        """Train the Q-learning model on a specific token over a number of episodes."""
-        logger.info(f"Starting training on {token_address} for {episodes} episodes")
-        self.epsilon = 1.0
+    async def _observe(self, token_addresses: List[str]) -> List[Tuple[Optional[State], Optional[Dict]]]:
+        """Refresh prices for all tokens with one batched fetch and build their states concurrently."""
+        await self._refresh_price_cache(token_addresses)
+        return await asyncio.gather(*(self.get_state(token_address) for token_address in token_addresses))
+
+    async def _update_q_values_batch(self, states: List[State], actions: List[str],
+                                     rewards: List[float], next_states: List[State]) -> None:
+        """Apply the Bellman update for a batch of transitions with one vectorized expression."""
+        state_rows = tuple(np.array([state.to_tuple() for state in states]).T)
+        next_state_rows = tuple(np.array([next_state.to_tuple() for next_state in next_states]).T)
+        action_indices = np.array([self.ACTION_INDEX[action] for action in actions])
+        cells = state_rows + (action_indices,)
+
+        async with self.q_table_lock:
+            best_next = self.q_table[next_state_rows].max(axis=1)
+            td_error = np.asarray(rewards, dtype=np.float32) + self.discount_factor * best_next - self.q_table[cells]
+            # np.add.at accumulates correctly when several tokens share a state/action cell
+            np.add.at(self.q_table, cells, self.learning_rate * td_error)
+
+    async def _load_replay_history(self, token_address: str) -> Optional[Tuple[State, np.ndarray, np.ndarray]]:
+        """Fetch recent minute closes for a token and precompute what replayed states need.
+
+        Returns a template state carrying the token's current sentiment and volume, the close
+        prices, and the rolling volatility at each close (NaN until the window fills). The latest
+        closes also seed the token's live volatility window. Sentiment is scored before returning,
+        since the background score is still 0.0 when training starts.
+        """
+        signals = await self._evaluate(token_address)
+        if not signals:
+            return None
+        price_data = signals.price_data
+
+        closes = np.asarray(await self.price_fetcher.get_price_history(price_data['pair_address']), dtype=np.float64)
+        if len(closes) < self.VOLATILITY_WINDOW + 2:
+            logger.warning(f"Only {len(closes)} minute candles of history for {token_address}. It will be trained on live prices.")
+            return None
+
+        returns = np.diff(closes) / closes[:-1]
+        windows = np.lib.stride_tricks.sliding_window_view(returns, self.VOLATILITY_WINDOW)
+        volatility = np.full(len(closes), np.nan)
+        volatility[self.VOLATILITY_WINDOW:] = windows.std(axis=1)
+        for close in closes[-(self.VOLATILITY_WINDOW + 1):]:
+            self._record_price(token_address, float(close))
+
+        template = State(
+            price_change=0.0,
+            sentiment_score=signals.sentiment,
+            volume=price_data['volume_24h'],
+            volatility=0.0,
+            time_since_last_trade=0.0,
+        )
+        return template, closes, volatility
+
+    async def train(self, token_addresses: List[str], episodes: int = 1000) -> None:
+        """Train the Q-learning model on a batch of tokens over a number of episodes.
+
+        Episodes replay consecutive minute candles sampled from recent price history, so training
+        needs no waiting or per-episode requests. Tokens without history fall back to live sampling.
+        """
+        logger.info(f"Starting training on {len(token_addresses)} tokens for {episodes} episodes")
+        loaded = await asyncio.gather(*(self._load_replay_history(token_address) for token_address in token_addresses))
+        histories = {token_address: history for token_address, history in zip(token_addresses, loaded) if history}
+        live_tokens = [token_address for token_address in token_addresses if token_address not in histories]
+
+        if histories:
+            await self._train_replay(list(histories.values()), episodes)
+        if live_tokens:
+            logger.warning(f"No price history for {len(live_tokens)} tokens. Training them on live prices.")
+            await self._train_live(live_tokens, episodes)
+
+        await self._save_q_table()
+
+    def _epsilon_schedule(self, episodes: int) -> np.ndarray:
+        """Exploration rate for each episode plus the final rate, decaying linearly to MIN_EPSILON."""
+        return np.maximum(1.0 - np.arange(episodes + 1) * self.epsilon_decay_rate, self.MIN_EPSILON)
+
+    async def _train_replay(self, histories: List[Tuple[State, np.ndarray, np.ndarray]], episodes: int) -> None:
+        """Run Q-learning episodes over historical price transitions, one per token per episode.
+
+        Each transition also samples a holding period of 0 to VOLATILITY_WINDOW candles. Zero replays
+        a flat state (no position, as when buying); otherwise price change and trade age are taken
+        relative to an entry that many candles earlier, as for an open position. Sentiment and
+        volume have no history and keep the token's current values.
+        """
+        epsilons = self._epsilon_schedule(episodes)
+        choose_action = self.choose_action
+        reward_function = self.reward_function
+        window = self.VOLATILITY_WINDOW
+        candle_seconds = self.REPLAY_CANDLE_SECONDS
 
         for episode in range(episodes):
-            state = await self.get_state(token_address)
-            if not state:
-                logger.warning(f"Could not retrieve initial state for {token_address}. Skipping episode.")
-                continue
+            self.epsilon = float(epsilons[episode])
+            states, actions, rewards, next_states = [], [], [], []
+            for template, closes, volatility in histories:
+                i = int(self._rng.integers(window, len(closes) - 1))
+                held = int(self._rng.integers(0, window + 1))
+                if held:
+                    inv_entry_price = 1.0 / closes[i - held]
+                    state = replace(template, volatility=volatility[i], price_change=closes[i] * inv_entry_price - 1.0,
+                                    time_since_last_trade=held * candle_seconds)
+                    next_state = replace(template, volatility=volatility[i + 1], price_change=closes[i + 1] * inv_entry_price - 1.0,
+                                         time_since_last_trade=(held + 1) * candle_seconds)
+                else:
+                    state = replace(template, volatility=volatility[i])
+                    next_state = replace(template, volatility=volatility[i + 1])
+                action = await choose_action(state)
+                states.append(state)
+                actions.append(action)
+                rewards.append(await reward_function(closes[i], closes[i + 1], action))
+                next_states.append(next_state)
+
+            await self._update_q_values_batch(states, actions, rewards, next_states)
+
+        self.epsilon = float(epsilons[-1])
+        logger.info(f"Replay training completed. Final epsilon: {self.epsilon:.4f}")
+
+    async def _train_live(self, token_addresses: List[str], episodes: int) -> None:
+        """Run Q-learning episodes on live prices.
+
+        Every episode observes all tokens from one batched price fetch, waits once, observes
+        them again and applies all resulting Q-updates together.
+        """
+        epsilons = self._epsilon_schedule(episodes)
+
+        # Bind per-episode callables to locals to skip repeated attribute lookups
+        observe = self._observe
+        choose_action = self.choose_action
+        reward_function = self.reward_function
+
+        for episode in range(episodes):
+            self.epsilon = float(epsilons[episode])
+            observations = await observe(token_addresses)
+            actions = [await choose_action(state) for state, _ in observations]
+
+            await asyncio.sleep(1)  # Let prices move between states
+            next_observations = await observe(token_addresses)
+
+            states, taken_actions, rewards, next_states = [], [], [], []
+            for (state, initial_data), action, (next_state, final_data) in zip(observations, actions, next_observations):
+                if not state or not next_state:
+                    continue
+                states.append(state)
+                taken_actions.append(action)
+                rewards.append(await reward_function(initial_data['price_usd'], final_data['price_usd'], action))
+                next_states.append(next_state)
+
+            if states:
+                await self._update_q_values_batch(states, taken_actions, rewards, next_states)
+            else:
+                logger.warning(f"Could not retrieve states for any token in episode {episode}.")
 
-            action = await self.choose_action(state)
-            price_data = await self._fetch_price_data(token_address)
-            if not price_data:
-                continue
-
-            initial_price = price_data['price_usd']
-            await asyncio.sleep(1)  # Simulate time passage between states
-            final_price = (await self._fetch_price_data(token_address))['price_usd']
-            reward = await self.reward_function(initial_price, final_price, action)
-            next_state = await self.get_state(token_address)
-            if next_state:
-                await self.update_q_value(state, action, reward, next_state)
-
-            # Decay exploration rate gradually
-            self.epsilon = max(self.epsilon - self.epsilon_decay_rate, self.MIN_EPSILON)
             if episode % 100 == 0:
                 logger.info(f"Episode {episode}/{episodes}, epsilon: {self.epsilon:.4f}")
 
-        logger.info(f"Training completed on {token_address}. Final epsilon: {self.epsilon:.4f}")
-        await self._save_q_table()
+        self.epsilon = float(epsilons[-1])
+        logger.info(f"Live training completed. Final epsilon: {self.epsilon:.4f}")
 
     @async_retry_with_backoff(retries=3, backoff_in_seconds=2)
     async def execute_buy(self, token_address: str, state: Optional[State] = None) -> bool:
         """Execute a buy order for the specified token."""
+        base_position_size = await self._get_base_position_size()
         if self.DYNAMIC_POSITION_SCALING and state:
             # Adjust position size dynamically based on volatility
             volatility = state.volatility
-            base_position_size = self.risk_manager.calculate_position_size()
             adjusted_position_size = base_position_size * (1 - volatility)  # Reduce size in high volatility
             sol_to_buy = max(adjusted_position_size, 0)  # Ensure non-negative
             logger.debug(f"Dynamic position sizing: volatility={volatility:.4f}, adjusted_size={sol_to_buy:.4f}")
         else:
-            sol_to_buy = self.risk_manager.calculate_position_size()
+            sol_to_buy = base_position_size
 
         if sol_to_buy <= 0:
             logger.warning(f"Calculated position size is {sol_to_buy}. Skipping buy for {token_address}.")
             return False
 
         try:
-            tx_signature = await self.jupiter_swap.swap(self.SOL_ADDRESS, token_address, sol_to_buy)
-            if not tx_signature:
+            swap_result = await self.jupiter_swap.swap(self.SOL_ADDRESS, token_address, sol_to_buy)
+            if not swap_result:
                 logger.warning(f"Buy order failed for {token_address}.")
                 return False
+            _, token_amount = swap_result
 
-            price_data = await self._fetch_price_data(token_address)
+            price_data = await self.price_fetcher.get_price_dexscreener(token_address)
             if not price_data:
                 logger.warning(f"Buy executed for {token_address} but failed to retrieve price data.")
                 return False
 
-            self.active_positions[token_address] = price_data['price_usd']
-            self.last_trade_time[token_address] = datetime.now()
+            entry_price = price_data['price_usd']
+            self.active_positions[token_address] = Position(
+                entry_price=entry_price,
+                token_amount=token_amount,
+                entry_time=datetime.now(),
+                stop_loss_price=self.risk_manager.calculate_stop_loss_price(entry_price),
+            )
+            self.last_trade_time[token_address] = time.monotonic()
             # Reset hold mode flag on new position
             self.hold_mode[token_address] = False
-            logger.info(f"Bought {token_address} at {price_data['price_usd']}.")
+            self._base_position_size = None
+            logger.info(f"Bought {token_address} at {entry_price}.")
             return True
         except Exception as e:
             logger.error(f"Error during buy execution for {token_address}: {e}")
             return False
 
+    async def _get_base_position_size(self) -> float:
+        """Return the base position size, querying the risk manager at most once per tick.
+
+        The cached value is cleared at the start of each tick and after every successful trade.
+        """
+        if self._base_position_size is None:
+            self._base_position_size = await self.risk_manager.calculate_position_size(allow_stale=True)
+        return self._base_position_size
+
     @async_retry_with_backoff(retries=3, backoff_in_seconds=2)
     async def execute_sell(self, token_address: str, partial: bool = False, reason: str = "strategy") -> bool:
         """Execute a sell order (either full or partial) for the specified token."""
+        position = self.active_positions.get(token_address)
+        if not position:
+            logger.warning(f"No open position for {token_address}. Skipping sell.")
+            return False
+
         try:
             # Determine the amount to sell: full position or a percentage during a surge hold
             if partial:
                 sell_percentage = self.PARTIAL_SELL_PERCENTAGE
             else:
                 sell_percentage = 1.0
-            sol_amount = self.risk_manager.calculate_position_size() * sell_percentage
+            token_amount = position.token_amount * sell_percentage
 
-            tx_signature = await self.jupiter_swap.swap(token_address, self.SOL_ADDRESS, sol_amount)
-            if not tx_signature:
+            swap_result = await self.jupiter_swap.swap(token_address, self.SOL_ADDRESS, token_amount)
+            if not swap_result:
                 logger.warning(f"Sell order failed for {token_address}.")
                 return False
 
-            price_data = await self._fetch_price_data(token_address)
+            price_data = await self.price_fetcher.get_price_dexscreener(token_address)
             current_price = price_data['price_usd'] if price_data else "unknown"
             logger.info(f"Sold {sell_percentage*100:.0f}% of {token_address} at {current_price} due to {reason}.")
 
-            # For full sell, remove the token from active positions; for partial, adjust the entry price
-            if not partial:
+            # For full sell, remove the token from active positions; for partial, reduce the held amount
+            if partial:
+                position.token_amount -= token_amount
+            else:
                 self.active_positions.pop(token_address, None)
                 self.hold_mode[token_address] = False
+            self._base_position_size = None
             return True
         except Exception as e:
             logger.error(f"Error during sell execution for {token_address}: {e}")
             return False
 
-    async def process_token(self, token_address: str) -> None:
-        """Evaluate a token and decide whether to buy, sell, or hold based on current state and surge detection."""
-        if not is_valid_solana_address(token_address):
-            logger.warning(f"Invalid token address: {token_address}. Skipping.")
-            return
+    async def _evaluate(self, token_address: str) -> Optional[TokenSignals]:
+        """Fetch and score a token's price and tweets once for all signal checks.
 
-        state = await self.get_state(token_address)
-        if not state:
+        Enough tweets are requested for the surge volume threshold to be reachable.
+        """
+        return await self.momentum_scalper.evaluate(token_address, num_tweets=self.surge_detector.surge_volume_threshold)
+
+    async def process_token(self, token_address: str) -> None:
+        """Evaluate a token and decide whether to buy, sell, or hold based on current state and surge detection.
+
+        The token address is expected to have been validated by the caller (see `trade_loop`),
+        and open positions to have already been checked against their stop-loss (see `_apply_stop_losses`).
+        """
+        decision = await self._decide(token_address)
+        if decision:
+            await self._execute_decision(token_address, decision)
+
+    async def _decide(self, token_address: str) -> Optional[Tuple[str, Optional[State]]]:
+        """Evaluate a token and return the trade to make as (action, state), or None to do nothing.
+
+        The action is 'buy', 'sell' or 'partial_sell'. Nothing is traded here, so this step can be
+        abandoned at any point without leaving the positions out of step with the wallet.
+        """
+        # Price and tweets are fetched and scored once, for both the state and the surge check
+        signals = await self._evaluate(token_address)
+        if not signals:
             logger.warning(f"Could not retrieve state for {token_address}.")
-            return
+            return None
+        position = self.active_positions.get(token_address)
+        state = self._build_state(token_address, signals.price_data, signals.sentiment)
 
         # Check surge potential using the integrated SurgeDetector
-        surge_signal = await self.surge_detector.detect_surges(token_address)
-        if surge_signal:
+        surge_signal = self.surge_detector.is_surge(signals)
+        hold = self.hold_mode.get(token_address, False)
+        if surge_signal and not hold:
             # If surge is detected, switch to hold mode if not already set
-            if not self.hold_mode.get(token_address, False):
-                logger.info(f"Surge signal detected for {token_address}. Switching to hold mode for gradual exit.")
-                self.hold_mode[token_address] = True
+            logger.info(f"Surge signal detected for {token_address}. Switching to hold mode for gradual exit.")
+            self.hold_mode[token_address] = hold = True
 
         # If we don't hold and no active position exists, consider buying
-        if token_address not in self.active_positions and not self.hold_mode.get(token_address, False):
+        if position is None and not hold:
             action = await self.choose_action(state)
-            if action == 'buy':
-                await self.execute_buy(token_address, state)
-            return
+            return ('buy', state) if action == 'buy' else None
 
-        # For tokens in active positions, check risk (e.g., stop-loss) and decide on selling strategy
-        price_data = await self._fetch_price_data(token_address)
-        if not price_data:
-            logger.warning(f"Missing price data for {token_address}.")
-            return
+        # For tokens in active positions (stop-loss was checked above), decide on selling strategy.
+        # If the bot is in surge hold mode, execute a partial sell strategy to gradually lock in profits
+        if hold:
+            return 'partial_sell', None
+        # Otherwise, follow the standard strategy: if action suggests selling, exit fully.
+        action = await self.choose_action(state)
+        return ('sell', None) if action == 'sell' else None
+
+    async def _execute_decision(self, token_address: str, decision: Tuple[str, Optional[State]]) -> None:
+        """Carry out a trade returned by _decide."""
+        action, state = decision
+        if action == 'buy':
+            await self.execute_buy(token_address, state)
+        elif action == 'partial_sell':
+            await self.execute_sell(token_address, partial=True, reason="surge hold partial exit")
+        else:
+            await self.execute_sell(token_address, partial=False, reason="strategy")
+
+    async def _apply_stop_losses(self) -> Set[str]:
+        """Sell every open position whose price is at or below its stop-loss, checked in one vectorised pass.
+
+        Runs before the per-token work so a forced exit skips the sentiment and volatility lookups.
+        Returns the tokens that were stopped out, which the rest of the tick leaves alone.
+        """
+        positions = list(self.active_positions.items())
+        # Cached prices return immediately; only the missing ones go to the network, as one load per token
+        price_data_list = await asyncio.gather(
+            *(self.price_fetcher.get_price_dexscreener(token_address) for token_address, _ in positions)
+        )
 
-        current_price = price_data["price_usd"]
-        entry_price = self.active_positions.get(token_address, current_price)
-        stop_loss_price = self.risk_manager.calculate_dynamic_stop_loss(entry_price, current_price)
+        priced = []  # (token_address, stop_loss_price, current_price)
+        for (token_address, position), price_data in zip(positions, price_data_list):
+            if price_data:
+                priced.append((token_address, position.stop_loss_price, price_data["price_usd"]))
+        if not priced:
+            return set()
+
+        count = len(priced)
+        stop_loss_prices = np.fromiter((stop_loss_price for _, stop_loss_price, _ in priced), dtype=np.float64, count=count)
+        current_prices = np.fromiter((price for _, _, price in priced), dtype=np.float64, count=count)
+        triggered = np.flatnonzero(self.risk_manager.check_stop_loss_batch(current_prices, stop_loss_prices))
+
+        stopped = [priced[i][0] for i in triggered]
+        for token_address in stopped:
+            logger.info(f"Stop-loss triggered for {token_address}.")
+        await asyncio.gather(*(self.execute_sell(token_address, partial=False, reason="stop-loss") for token_address in stopped))
+        return set(stopped)
+
+    async def _process_token_safe(self, token_address: str, timeout: float) -> None:
+        """Run process_token with its evaluation under a time limit, logging instead of raising on failure.
+
+        Keeps one stalled or failing token from delaying or aborting the rest of the tick. The
+        resulting trade runs outside the time limit: cancelling a swap after it was sent would
+        leave the bought tokens without a recorded position, or a sold position still recorded.
+        """
+        try:
+            decision = await asyncio.wait_for(self._decide(token_address), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Evaluating {token_address} timed out after {timeout:.1f}s.")
+            return
+        except Exception as e:
+            logger.error(f"Error processing {token_address}: {e}")
+            return
 
-        # If stop-loss conditions are met, perform a full sell
-        if self.risk_manager.check_stop_loss(current_price, stop_loss_price):
-            await self.execute_sell(token_address, partial=False, reason="stop-loss")
+        if not decision:
             return
+        try:
+            await self._execute_decision(token_address, decision)
+        except Exception as e:
+            logger.error(f"Error trading {token_address}: {e}")
 
-        # If the bot is in surge hold mode, execute a partial sell strategy to gradually lock in profits
-        if self.hold_mode.get(token_address, False):
-            await self.execute_sell(token_address, partial=True, reason="surge hold partial exit")
-        else:
-            # Otherwise, follow the standard strategy: if action suggests selling, exit fully.
-            action = await self.choose_action(state)
-            if action == 'sell':
-                await self.execute_sell(token_address, partial=False, reason="strategy")
+    async def shutdown(self) -> None:
+        """Persist learned state and release network resources."""
+        await self._save_q_table()
+        await close_rpc_client()  # Also the JupiterSwap client
+        await close_http_session()
 
     async def trade_loop(self, token_addresses: List[str]) -> None:
         """Main trading loop that continuously evaluates tokens and applies trading strategies."""
@@ -373,24 +673,46 @@ class TradingBot:
             logger.error("Invalid or missing wallet address. Trading loop cannot start.")
             return
 
-        logger.info(f"Starting trading loop for {len(token_addresses)} tokens...")
-
-        # Initial training phase for each token
+        # Validate addresses once up front instead of on every tick
+        self.tokens = []
         for token_address in token_addresses:
             if is_valid_solana_address(token_address):
-                await self.train(token_address, episodes=1000)
+                self.tokens.append(token_address)
             else:
-                logger.warning(f"Skipping training for invalid token address: {token_address}")
+                logger.warning(f"Skipping invalid token address: {token_address}")
+
+        logger.info(f"Starting trading loop for {len(self.tokens)} tokens...")
 
-        # Main loop for live trading decisions
+        # Per-tick callables are bound to locals
+        tokens = self.tokens
+        refresh_price_cache = self._refresh_price_cache
+        apply_stop_losses = self._apply_stop_losses
+        process_token_safe = self._process_token_safe
+        token_timeout = self.config.SLEEP_INTERVAL * self.TOKEN_TIMEOUT_FRACTION
+        backoff = 1.0
         try:
+            # Initial training phase over all tokens at once; inside the try so an interrupt still shuts down cleanly
+            await self.train(tokens, episodes=1000)
+
+            # Main loop for live trading decisions
             while True:
-                tasks = [self.process_token(token_address) for token_address in token_addresses]
-                await asyncio.gather(*tasks)
+                try:
+                    self._base_position_size = None
+                    await refresh_price_cache(tokens)
+                    stopped = await apply_stop_losses()
+                    await asyncio.gather(*(
+                        process_token_safe(token_address, token_timeout) for token_address in tokens if token_address not in stopped
+                    ))
+                except Exception as e:
+                    # Back off exponentially (with jitter) so failing APIs aren't hammered every tick
+                    delay = backoff + random.random()
+                    logger.error(f"Error in trading loop: {e}. Retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    backoff = min(backoff * 2, self.MAX_LOOP_BACKOFF)
+                    continue
+                backoff = 1.0
                 await asyncio.sleep(self.config.SLEEP_INTERVAL)
         except KeyboardInterrupt:
             logger.info("Trading loop stopped by user.")
-        except Exception as e:
-            logger.error(f"Critical error in trading loop: {e}")
         finally:
-            await self._save_q_table()
\ No newline at end of file
+            await self.shutdown()
\ No newline at end of file
@@ -1,102 +1,125 @@
 import asyncio
+import random
 import aiohttp # type: ignore
-from typing import Optional, Dict, List, Tuple
-from datetime import datetime, timedelta
+from typing import Optional, Dict, List
 
 from ..utils.logger import logger
 from ..utils.config import config
+from ..utils.helpers import SingleFlightCache, get_http_session, json_loads
+from ..utils.rate_limiter import TokenBucket
 
 
 class PriceFetcher:
+    BATCH_SIZE = 30  # Maximum addresses accepted per Dexscreener tokens request
+
     def __init__(self):
         self.dexscreener_api_key = config.DEXSCREENER_API_KEY
         if not self.dexscreener_api_key:
             logger.warning("DEX Screener API key not found. Functionality will be limited.")
 
         # Rate limiting and caching
-        self.last_api_call_time = datetime.now()
-        self.api_call_interval = timedelta(seconds=1)  # Rate limit: 1 call per second
-        self.price_cache: Dict[str, Tuple[Dict, datetime]] = {}  # token_address -> (price_data, timestamp)
-        self.cache_ttl = timedelta(seconds=60)  # Cache TTL: 60 seconds
+        self.rate_limiter = TokenBucket(rate=5)  # Dexscreener allows 300 requests per minute
+        self.history_rate_limiter = TokenBucket(rate=0.5)  # GeckoTerminal's public API allows about 30 requests per minute
+        self.price_cache = SingleFlightCache(maxsize=10_000, ttl=60)  # token_address -> price_data, expires after 60 seconds
 
     async def get_price_dexscreener(self, token_address: str, max_retries: int = 3, retry_delay: int = 2) -> Optional[Dict[str, float]]:
         """
         Gets real-time price data from Dexscreener with retry logic.
         """
-        # Check cache first
-        if token_address in self.price_cache:
-            price_data, timestamp = self.price_cache[token_address]
-            if datetime.now() - timestamp < self.cache_ttl:
-                return price_data
+        # Concurrent requests for the same token share a single fetch
+        return await self.price_cache.get_or_load(
+            token_address, lambda: self._fetch_price(token_address, max_retries, retry_delay)
+        )
 
+    async def _fetch_price(self, token_address: str, max_retries: int, retry_delay: int) -> Optional[Dict[str, float]]:
+        """
+        Fetches price data for a single token through the batch endpoint, retrying on failure.
+        """
         for attempt in range(max_retries):
-            try:
-                # Rate limiting
-                await self._enforce_rate_limit()
-
-                url = f"https://api.dexscreener.com/latest/dex/tokens/{token_address}"
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url, timeout=10) as response:
-                        response.raise_for_status()
-                        data = await response.json()
-
-                        price_data = self._parse_price_data(data)
-                        if price_data:
-                            # Update cache
-                            self.price_cache[token_address] = (price_data, datetime.now())
-                            return price_data
-
-                        logger.warning(f"Invalid data for {token_address} (attempt {attempt + 1}/{max_retries})")
-            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-                if attempt + 1 < max_retries:
-                    logger.warning(f"Request error: {e}. Retrying in {retry_delay}s (attempt {attempt + 1}/{max_retries})")
-                    await asyncio.sleep(min(retry_delay, 10))
-                    retry_delay *= 2
-                else:
-                    logger.error(f"Final failure fetching data for {token_address}: {e}")
-                    break
+            prices = await self._fetch_price_chunk([token_address])
+            if token_address in prices:
+                return prices[token_address]
+
+            if attempt + 1 < max_retries:
+                # Full jitter keeps concurrent failing callers from retrying in lockstep
+                delay = random.uniform(0, min(10, retry_delay * 2 ** attempt))
+                logger.warning(f"No price data for {token_address}. Retrying in {delay:.1f}s (attempt {attempt + 1}/{max_retries})")
+                await asyncio.sleep(delay)
 
         logger.error(f"Failed to get price data from Dexscreener for {token_address} after {max_retries} attempts.")
         return None
 
+    async def get_price_history(self, pair_address: str, limit: int = 1000) -> List[float]:
+        """
+        Fetches up to `limit` one-minute close prices for a Solana pool from GeckoTerminal, oldest first.
+        """
+        # Rate limiting
+        await self.history_rate_limiter.acquire()
+
+        try:
+            url = f"https://api.geckoterminal.com/api/v2/networks/solana/pools/{pair_address}/ohlcv/minute"
+            session = get_http_session()
+            async with session.get(url, params={"aggregate": 1, "limit": limit}) as response:
+                response.raise_for_status()
+                data = json_loads(await response.read())
+                ohlcv_list = data["data"]["attributes"]["ohlcv_list"]  # [timestamp, open, high, low, close, volume], newest first
+                return [float(candle[4]) for candle in reversed(ohlcv_list)]
+        except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, ValueError) as e:
+            logger.error(f"Error fetching price history for pool {pair_address}: {e}")
+            return []
+
     async def get_prices_dexscreener_batch(self, token_addresses: List[str]) -> Dict[str, Dict]:
         """
-        Fetches price data for multiple tokens in a single batch request.
+        Fetches price data for multiple tokens, one request per chunk of up to 30 addresses.
+        """
+        token_addresses = list(dict.fromkeys(token_addresses))  # Drop duplicates, keeping order
+        chunks = [
+            token_addresses[i:i + self.BATCH_SIZE]
+            for i in range(0, len(token_addresses), self.BATCH_SIZE)
+        ]
+        results = await asyncio.gather(*(self._fetch_price_chunk(chunk) for chunk in chunks))
+
+        prices = {}
+        for chunk_prices in results:
+            prices.update(chunk_prices)
+        return prices
+
+    async def _fetch_price_chunk(self, token_addresses: List[str]) -> Dict[str, Dict]:
+        """
+        Fetches price data for a single chunk of token addresses and caches each result.
         """
         # Rate limiting
-        await self._enforce_rate_limit()
+        await self.rate_limiter.acquire()
 
         try:
-            url = "https://api.dexscreener.com/latest/dex/tokens"
-            params = {"addresses": ",".join(token_addresses)}
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params, timeout=10) as response:
-                    response.raise_for_status()
-                    data = await response.json()
-
-                    prices = {}
-                    for token_data in data.get("pairs", []):
-                        token_address = token_data["baseToken"]["address"]
-                        price_data = self._parse_price_data({"pairs": [token_data]})
-                        if price_data:
-                            prices[token_address] = price_data
-                    return prices
+            url = f"https://api.dexscreener.com/latest/dex/tokens/{','.join(token_addresses)}"
+            session = get_http_session()
+            async with session.get(url) as response:
+                response.raise_for_status()
+                data = json_loads(await response.read())
+
+                prices = {}
+                for token_data in data.get("pairs") or []:
+                    token_address = token_data["baseToken"]["address"]
+                    if token_address in prices:
+                        continue  # Keep the first (most liquid) pair per token
+                    price_data = self._parse_price_data(token_data)
+                    if price_data:
+                        prices[token_address] = price_data
+                self.price_cache.update(prices)
+                return prices
         except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             logger.error(f"Error fetching batch price data: {e}")
             return {}
 
-    def _parse_price_data(self, data: dict) -> Optional[Dict[str, float]]:
+    def _parse_price_data(self, pair: dict) -> Optional[Dict[str, float]]:
         """
-        Parse the price data from the Dexscreener API response.
+        Parse the price data from a single pair in the Dexscreener API response.
         """
-        if not data.get("pairs"):
-            return None
-
-        pair = data["pairs"][0]
         try:
-            price_usd = float(pair["priceUsd"])
-            liquidity_usd = float(pair["liquidity"]["usd"])
-            volume_24h = float(pair["volume"]["h24"])
+            price_usd = float(pair["priceUsd"])  # Dexscreener sends prices as strings
+            liquidity_usd = pair["liquidity"]["usd"]  # Liquidity and volume are already JSON numbers
+            volume_24h = pair["volume"]["h24"]
 
             # Validate numeric values
             if price_usd <= 0 or liquidity_usd <= 0 or volume_24h < 0:
@@ -105,20 +128,12 @@ class PriceFetcher:
 
             return {
                 "price_usd": price_usd,
+                "pair_address": pair["pairAddress"],
                 "base_token_symbol": pair["baseToken"]["symbol"],
                 "quote_token_symbol": pair["quoteToken"]["symbol"],
                 "volume_24h": volume_24h,
                 "liquidity_usd": liquidity_usd
             }
-        except (KeyError, ValueError) as e:
+        except (KeyError, TypeError, ValueError) as e:
             logger.error(f"Failed to parse price data: {e}")
             return None
-
-    async def _enforce_rate_limit(self) -> None:
-        """
-        Ensures API calls respect the rate limit.
-        """
-        time_since_last_call = datetime.now() - self.last_api_call_time
-        if time_since_last_call < self.api_call_interval:
-            await asyncio.sleep((self.api_call_interval - time_since_last_call).total_seconds())
-        self.last_api_call_time = datetime.now()
\ No newline at end of file
@@ -1,18 +1,110 @@
 import asyncio
+import itertools
+import multiprocessing
 import os
+import queue
 import random
-from typing import List, Dict, Optional, Tuple
-from datetime import datetime, timedelta
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 
+from cachetools import LRUCache, TTLCache
+import numpy as np
 import snscrape.modules.twitter as sntwitter
 import praw
-from transformers import pipeline
 from ..utils.logger import logger
+from ..utils.rate_limiter import TokenBucket
+
+try:
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+except ImportError:  # VADER is optional; every text then goes through the transformer
+    SentimentIntensityAnalyzer = None
+
+SENTIMENT_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"
+QUANTIZED_MODEL_DIR = "sentiment_model_int8"  # int8 ONNX export, created on first CPU run
+
+# torch, transformers and optimum are imported inside the functions below, which only run in the
+# inference process, so the trading process never pays their multi-second import cost.
+
+
+def _build_quantized_pipeline():
+    """Loads the int8 ONNX sentiment model, exporting and quantizing it first if it isn't cached yet."""
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer, pipeline
+
+    if not os.path.isdir(QUANTIZED_MODEL_DIR):
+        logger.info(f"Exporting {SENTIMENT_MODEL} to int8 ONNX in {QUANTIZED_MODEL_DIR}...")
+        ort_model = ORTModelForSequenceClassification.from_pretrained(SENTIMENT_MODEL, export=True)
+        ort_model.save_pretrained(QUANTIZED_MODEL_DIR)
+        AutoTokenizer.from_pretrained(SENTIMENT_MODEL).save_pretrained(QUANTIZED_MODEL_DIR)
+        quantizer = ORTQuantizer.from_pretrained(ort_model)
+        quantizer.quantize(
+            save_dir=QUANTIZED_MODEL_DIR,
+            quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False),
+        )
+
+    model = ORTModelForSequenceClassification.from_pretrained(QUANTIZED_MODEL_DIR, file_name="model_quantized.onnx")
+    tokenizer = AutoTokenizer.from_pretrained(QUANTIZED_MODEL_DIR)
+    return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
+
+
+@lru_cache(maxsize=1)
+def _get_sentiment_pipeline():
+    """
+    Builds the sentiment pipeline for the available hardware, once per process.
+
+    On a GPU the model runs in half precision (bfloat16 where supported, which can't overflow
+    the way float16 activations can). On CPU a dynamically quantized int8 ONNX
+    export is used when optimum is installed, falling back to the FP32 PyTorch model.
+    Each batch is padded only to its longest text.
+    """
+    import torch
+    from transformers import pipeline
+
+    if torch.cuda.is_available():
+        dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        return pipeline("sentiment-analysis", model=SENTIMENT_MODEL, device=0, torch_dtype=dtype)
+
+    try:
+        return _build_quantized_pipeline()
+    except ImportError:  # optimum is optional; CPU inference then uses the PyTorch model
+        pass
+    except Exception as e:
+        logger.warning(f"Failed to load quantized sentiment model, using the PyTorch model instead: {e}")
+
+    return pipeline("sentiment-analysis", model=SENTIMENT_MODEL)
+
+
+def _run_sentiment_pipeline(text_list: List[str], batch_size: int) -> List[Dict]:
+    """Runs the sentiment model over `text_list`; executed in the inference process."""
+    return _get_sentiment_pipeline()(text_list, batch_size=batch_size, truncation=True)
+
+
+@lru_cache(maxsize=1)
+def _get_inference_pool() -> ProcessPoolExecutor:
+    """
+    Returns the single-worker process that hosts the sentiment model, starting it on first use.
+
+    Forward passes run there so they never hold this process's GIL while the event loop is
+    servicing network callbacks. The worker loads the model as soon as it starts.
+    """
+    return ProcessPoolExecutor(
+        max_workers=1,
+        mp_context=multiprocessing.get_context("spawn"),  # Forking a process with CUDA or torch threads is unsafe
+        initializer=_get_sentiment_pipeline,
+    )
 
 
 class SocialScraper:
+    SENTIMENT_BATCH_SIZE = 64  # Texts per model forward pass
+    VADER_DECISIVE_THRESHOLD = 0.3  # |compound| at or above which the lexicon score is used without the model
+    MAX_TEXT_CHARS = 2048  # Roughly the model's 512-token input limit; longer texts are clipped before tokenizing
+
     def __init__(self):
-        self.sentiment_pipeline = pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english")
+        self.inference_pool = _get_inference_pool()
+        self.vader = SentimentIntensityAnalyzer() if SentimentIntensityAnalyzer else None
         self.reddit_client_id = os.getenv("REDDIT_CLIENT_ID")
         self.reddit_client_secret = os.getenv("REDDIT_CLIENT_SECRET")
         self.reddit_user_agent = os.getenv("REDDIT_USER_AGENT")
@@ -32,35 +124,40 @@ class SocialScraper:
                 self.reddit = None
 
         # Rate limiting and caching
-        self.last_twitter_call_time = datetime.now()
-        self.twitter_call_interval = timedelta(seconds=1)  # Rate limit: 1 call per second
-        self.last_reddit_call_time = datetime.now()
-        self.reddit_call_interval = timedelta(seconds=1)  # Rate limit: 1 call per second
-        self.scraped_data_cache: Dict[str, Tuple[List[str], datetime]] = {}  # query/subreddit -> (data, timestamp)
-        self.cache_ttl = timedelta(seconds=60)  # Cache TTL: 60 seconds
+        self.twitter_rate_limiter = TokenBucket(rate=1)  # Rate limit: 1 call per second
+        self.reddit_rate_limiter = TokenBucket(rate=1)  # Rate limit: 1 call per second
+        self.scraped_data_cache: TTLCache = TTLCache(maxsize=1_000, ttl=60)  # (query, count)/subreddit -> data, expires after 60 seconds
+
+        # Background sentiment scoring: queued (key, texts) requests are batched by a worker thread
+        self.sentiment_queue: "queue.Queue[Tuple[str, List[str]]]" = queue.Queue()
+        self.sentiment_scores: Dict[str, float] = {}  # key -> latest overall sentiment score
+        self.text_score_cache: LRUCache = LRUCache(maxsize=100_000)  # text -> positivity score, shared by both scoring paths
+        self.text_score_lock = threading.Lock()
+        self._sentiment_worker = threading.Thread(target=self._run_sentiment_worker, daemon=True)
+        self._sentiment_worker.start()
 
     async def scrape_twitter(self, query: str, num_tweets: int = 100, max_retries: int = 3) -> List[str]:
         """Scrapes tweets from Twitter using snscrape with rate limiting and retries."""
         # Check cache first
-        if query in self.scraped_data_cache:
-            tweets, timestamp = self.scraped_data_cache[query]
-            if datetime.now() - timestamp < self.cache_ttl:
-                return tweets
+        tweets = self.scraped_data_cache.get((query, num_tweets))
+        if tweets is not None:
+            return tweets
 
         for attempt in range(max_retries):
             try:
                 # Rate limiting
-                await self._enforce_rate_limit("twitter")
+                await self.twitter_rate_limiter.acquire()
 
-                # Use asyncio.to_thread to run synchronous snscrape in a separate thread
+                # Use asyncio.to_thread to run synchronous snscrape in a separate thread, stopping the
+                # search generator after num_tweets instead of draining it
                 tweets = await asyncio.to_thread(
                     lambda: [
-                        tweet.content for i, tweet in enumerate(sntwitter.TwitterSearchScraper(query).get_items())
-                        if i < num_tweets
+                        tweet.content
+                        for tweet in itertools.islice(sntwitter.TwitterSearchScraper(query).get_items(), num_tweets)
                     ]
                 )
                 # Update cache
-                self.scraped_data_cache[query] = (tweets, datetime.now())
+                self.scraped_data_cache[(query, num_tweets)] = tweets
                 return tweets
             except Exception as e:
                 logger.error(f"Error scraping Twitter (Attempt {attempt + 1}/{max_retries}): {e}")
@@ -68,6 +165,42 @@ class SocialScraper:
         logger.error(f"Failed to scrape Twitter after {max_retries} attempts.")
         return []
 
+    async def stream_twitter(self, query: str, max_tweets: int = 100, chunk_size: int = 20) -> AsyncIterator[List[str]]:
+        """
+        Yields tweets from Twitter in chunks of up to chunk_size, stopping after max_tweets.
+
+        The search only advances as far as the caller reads, so a caller that stops iterating
+        early also stops the scrape. A fully read result is cached the same way scrape_twitter's is.
+        """
+        cache_key = (query, max_tweets)
+        tweets = self.scraped_data_cache.get(cache_key)
+        if tweets is not None:
+            for i in range(0, len(tweets), chunk_size):
+                yield tweets[i:i + chunk_size]
+            return
+
+        # Rate limiting
+        await self.twitter_rate_limiter.acquire()
+
+        tweets = []
+        try:
+            items = sntwitter.TwitterSearchScraper(query).get_items()
+            while len(tweets) < max_tweets:
+                count = min(chunk_size, max_tweets - len(tweets))
+                chunk = await asyncio.to_thread(lambda: [tweet.content for tweet in itertools.islice(items, count)])
+                if not chunk:
+                    break
+                tweets.extend(chunk)
+                yield chunk
+                if len(chunk) < count:
+                    break
+        except Exception as e:
+            logger.error(f"Error streaming tweets for {query}: {e}")
+            return
+
+        # Update cache
+        self.scraped_data_cache[cache_key] = tweets
+
     async def scrape_reddit(self, subreddit: str, num_posts: int = 50, max_retries: int = 3) -> List[str]:
         """Scrapes posts from a subreddit using PRAW with rate limiting and retries."""
         if not self.reddit:
@@ -75,15 +208,14 @@ class SocialScraper:
             return []
 
         # Check cache first
-        if subreddit in self.scraped_data_cache:
-            posts, timestamp = self.scraped_data_cache[subreddit]
-            if datetime.now() - timestamp < self.cache_ttl:
-                return posts
+        posts = self.scraped_data_cache.get(subreddit)
+        if posts is not None:
+            return posts
 
         for attempt in range(max_retries):
             try:
                 # Rate limiting
-                await self._enforce_rate_limit("reddit")
+                await self.reddit_rate_limiter.acquire()
 
                 # Use asyncio.to_thread to run synchronous PRAW in a separate thread
                 posts = await asyncio.to_thread(
@@ -93,7 +225,7 @@ class SocialScraper:
                     ]
                 )
                 # Update cache
-                self.scraped_data_cache[subreddit] = (posts, datetime.now())
+                self.scraped_data_cache[subreddit] = posts
                 return posts
             except Exception as e:
                 logger.error(f"Error scraping Reddit (Attempt {attempt + 1}/{max_retries}): {e}")
@@ -104,43 +236,101 @@ class SocialScraper:
     def analyze_sentiment(self, text: str) -> Dict[str, float]:
         """Analyzes the sentiment of a given text using a transformer model."""
         try:
-            result = self.sentiment_pipeline(text)[0]
+            result = self.inference_pool.submit(_run_sentiment_pipeline, [text], 1).result()[0]
             return result
         except Exception as e:
             logger.error(f"Error analyzing sentiment: {e}")
             return {"label": "NEUTRAL", "score": 0.5}
 
+    def _score_texts(self, text_list: List[str]) -> np.ndarray:
+        """
+        Scores texts in batches of SENTIMENT_BATCH_SIZE, mapping each to a positivity score in [0, 1].
+
+        Only texts that haven't been scored before are considered; retweets and cross-posts are
+        answered from the text score cache. When VADER is installed, texts its lexicon scores
+        decisively skip the model too, and only the ambiguous rest goes through DistilBERT.
+        Decisive lexicon scores are mapped to 1.0 or 0.0 so both sources share the model's scale.
+        """
+        with self.text_score_lock:
+            cached = [self.text_score_cache.get(text) for text in text_list]
+        misses = list(dict.fromkeys(text for text, score in zip(text_list, cached) if score is None))
+
+        new_scores: Dict[str, float] = {}
+        if misses and self.vader:
+            ambiguous = []
+            for text in misses:
+                compound = self.vader.polarity_scores(text)["compound"]
+                if abs(compound) >= self.VADER_DECISIVE_THRESHOLD:
+                    # The model scores clear-cut texts at about 0.99 or 0.01, so a decisive lexicon verdict
+                    # counts as fully positive or negative; (compound + 1) / 2 would pull averages toward 0.5
+                    new_scores[text] = 1.0 if compound > 0 else 0.0
+                else:
+                    ambiguous.append(text)
+            misses = ambiguous
+
+        if misses:
+            # Length-sorted batches pad tightly, and clipping long posts up front spares the
+            # tokenizer work on text the model would truncate anyway
+            misses.sort(key=len)
+            model_inputs = [text[:self.MAX_TEXT_CHARS] for text in misses]
+            sentiment_results = self.inference_pool.submit(_run_sentiment_pipeline, model_inputs, self.SENTIMENT_BATCH_SIZE).result()
+            count = len(sentiment_results)
+            positive = np.fromiter((result["label"] == "POSITIVE" for result in sentiment_results), dtype=bool, count=count)
+            scores = np.fromiter((result["score"] for result in sentiment_results), dtype=np.float32, count=count)
+            new_scores.update(zip(misses, np.where(positive, scores, 1 - scores).tolist()))
+
+        if new_scores:
+            with self.text_score_lock:
+                self.text_score_cache.update(new_scores)
+
+        return np.fromiter(
+            (new_scores[text] if score is None else score for text, score in zip(text_list, cached)),
+            dtype=np.float32,
+            count=len(text_list),
+        )
+
     def get_overall_sentiment(self, text_list: List[str]) -> float:
         """Calculates an overall sentiment score from a list of texts."""
         if not text_list:
             return 0.0
         try:
-            # Process sentiment analysis in batches to improve efficiency
-            batch_size = 32  # Adjust based on model and hardware capabilities
-            scores = []
-            for i in range(0, len(text_list), batch_size):
-                batch = text_list[i:i + batch_size]
-                sentiment_results = self.sentiment_pipeline(batch)
-                scores.extend([
-                    result["score"] if result["label"] == "POSITIVE" else 1 - result["score"]
-                    for result in sentiment_results
-                ])
-            return sum(scores) / len(scores)
+            return float(self._score_texts(text_list).mean())
         except Exception as e:
             logger.error(f"Error analyzing batch sentiment: {e}")
             return 0.0
 
-    async def _enforce_rate_limit(self, platform: str) -> None:
-        """
-        Ensures API calls respect the rate limit for the specified platform.
-        """
-        if platform == "twitter":
-            time_since_last_call = datetime.now() - self.last_twitter_call_time
-            if time_since_last_call < self.twitter_call_interval:
-                await asyncio.sleep((self.twitter_call_interval - time_since_last_call).total_seconds())
-            self.last_twitter_call_time = datetime.now()
-        elif platform == "reddit":
-            time_since_last_call = datetime.now() - self.last_reddit_call_time
-            if time_since_last_call < self.reddit_call_interval:
-                await asyncio.sleep((self.reddit_call_interval - time_since_last_call).total_seconds())
-            self.last_reddit_call_time = datetime.now()
\ No newline at end of file
+    def submit_sentiment(self, key: str, text_list: List[str]) -> None:
+        """Queues texts for background scoring; the result is stored under `key`."""
+        if not text_list:
+            self.sentiment_scores[key] = 0.0
+            return
+        self.sentiment_queue.put((key, text_list))
+
+    def get_cached_sentiment(self, key: str) -> float:
+        """Returns the latest background sentiment score for `key`, or 0.0 if none is available yet."""
+        return self.sentiment_scores.get(key, 0.0)
+
+    def _run_sentiment_worker(self) -> None:
+        """Drains queued requests and scores all of their texts together in as few model calls as possible."""
+        while True:
+            requests = [self.sentiment_queue.get()]
+            pending_texts = len(requests[0][1])
+            while pending_texts < self.SENTIMENT_BATCH_SIZE:
+                try:
+                    request = self.sentiment_queue.get_nowait()
+                except queue.Empty:
+                    break
+                requests.append(request)
+                pending_texts += len(request[1])
+
+            try:
+                scores = self._score_texts([text for _, texts in requests for text in texts])
+            except Exception as e:
+                logger.error(f"Error analyzing queued sentiment: {e}")
+                continue
+
+            offset = 0
+            for key, texts in requests:
+                key_scores = scores[offset:offset + len(texts)]
+                offset += len(texts)
+                self.sentiment_scores[key] = float(key_scores.mean())
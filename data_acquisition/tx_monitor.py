@@ -1,27 +1,36 @@
 import asyncio
 import logging
-from typing import Dict, Optional
-from solders.rpc.api import Client
-from solders.rpc.config import RpcContextConfig
+from typing import Dict, List, Optional
+from solana.rpc.commitment import Finalized
+from solana.rpc.websocket_api import connect
 from solders.signature import Signature
-from solders.transaction_status import TransactionConfirmationStatus
+from solders.transaction_status import TransactionConfirmationStatus, TransactionStatus
 
 from ..utils.logger import logger
 from ..utils.config import config
+from ..utils.helpers import get_rpc_client
+from ..utils.rate_limiter import TokenBucket
 
 
 class TxMonitor:
+    STATUS_BATCH_SIZE = 256  # Maximum signatures accepted per getSignatureStatuses request
+
     def __init__(self):
         """Initialize the transaction monitor with a Solana RPC client."""
-        self.rpc_client = Client(config.SOLANA_RPC_URL)
+        self.rpc_client = get_rpc_client()  # Shared async client, closed by close_rpc_client()
+        self.ws_url = config.SOLANA_RPC_URL.replace("https://", "wss://", 1).replace("http://", "ws://", 1)
+        self.confirmation_timeout = 60  # Seconds to wait for a websocket confirmation before polling
         self.max_retries = 5  # Maximum number of retries for transaction confirmation
         self.retry_delay = 2  # Initial delay between retries in seconds
-        self.rate_limit_interval = timedelta(seconds=1)  # Rate limit: 1 call per second
-        self.last_api_call_time = datetime.now()
+        self.rate_limiter = TokenBucket(rate=1)  # Rate limit: 1 call per second
 
     async def confirm_transaction(self, tx_signature: str) -> bool:
         """
         Confirm that a transaction is finalized on the Solana blockchain.
+
+        Waits for a signatureSubscribe notification on the RPC websocket, so finalization is
+        seen as soon as the cluster reports it. Falls back to polling if the websocket fails
+        or stays silent for confirmation_timeout seconds.
         
         Args:
             tx_signature: The transaction signature (hash) to monitor.
@@ -30,13 +39,43 @@ class TxMonitor:
             bool: True if the transaction is confirmed, False otherwise.
         """
         signature = Signature.from_string(tx_signature)
+
+        async def wait_for_notification():
+            async with connect(self.ws_url) as websocket:
+                await websocket.signature_subscribe(signature, commitment=Finalized)
+                await websocket.recv()  # Subscription acknowledgement
+                return (await websocket.recv())[0]
+
+        try:
+            # One deadline covers the acknowledgement too, so a silent socket can't stall before the notification
+            notification = await asyncio.wait_for(wait_for_notification(), self.confirmation_timeout)
+            if notification.result.value.err:
+                logger.error(f"Transaction {tx_signature} failed: {notification.result.value.err}")
+                return False
+            logger.info(f"Transaction {tx_signature} confirmed.")
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"No confirmation for {tx_signature} after {self.confirmation_timeout}s. Falling back to polling.")
+        except Exception as e:
+            logger.warning(f"Websocket confirmation failed for {tx_signature}: {e}. Falling back to polling.")
+
+        return await self._poll_confirmation(signature, tx_signature)
+
+    async def _poll_confirmation(self, signature: Signature, tx_signature: str) -> bool:
+        """
+        Poll the transaction status until it is finalized or retries run out.
+
+        Args:
+            signature: The parsed transaction signature.
+            tx_signature: The transaction signature as a string, for logging.
+
+        Returns:
+            bool: True if the transaction is confirmed, False otherwise.
+        """
         for attempt in range(self.max_retries):
             try:
-                # Rate limiting
-                await self._enforce_rate_limit()
-
                 # Fetch the transaction status
-                tx_status = await self.rpc_client.get_signature_status(signature, RpcContextConfig(commitment="confirmed"))
+                tx_status = (await self._get_signature_statuses([signature]))[0]
                 if tx_status is None:
                     logger.warning(f"Transaction {tx_signature} not found (attempt {attempt + 1}/{self.max_retries})")
                     await asyncio.sleep(self.retry_delay * (attempt + 1))  # Exponential backoff
@@ -66,14 +105,49 @@ class TxMonitor:
         Returns:
             Dict[str, bool]: A dictionary mapping token addresses to their transaction confirmation status.
         """
-        results = {}
-        for token_address, tx_signature in tx_signatures.items():
-            confirmed = await self.confirm_transaction(tx_signature)
-            results[token_address] = confirmed
-            if not confirmed:
-                await self.handle_failed_transaction(tx_signature, token_address)
+        results = {token_address: False for token_address in tx_signatures}
+        pending = {token_address: Signature.from_string(tx_signature) for token_address, tx_signature in tx_signatures.items()}
+
+        # Poll every outstanding signature together, one batched request per round
+        for attempt in range(self.max_retries):
+            try:
+                tx_statuses = await self._get_signature_statuses(list(pending.values()))
+                for token_address, tx_status in zip(list(pending), tx_statuses):
+                    if tx_status and tx_status.confirmation_status == TransactionConfirmationStatus.Finalized:
+                        logger.info(f"Transaction {tx_signatures[token_address]} confirmed.")
+                        results[token_address] = True
+                        del pending[token_address]
+            except Exception as e:
+                logger.error(f"Error polling transaction statuses: {e}")
+
+            if not pending:
+                break
+            if attempt + 1 < self.max_retries:
+                logger.warning(f"{len(pending)} transactions not yet finalized (attempt {attempt + 1}/{self.max_retries})")
+                await asyncio.sleep(self.retry_delay * (attempt + 1))  # Exponential backoff
+
+        for token_address in pending:
+            logger.error(f"Failed to confirm transaction {tx_signatures[token_address]} after {self.max_retries} attempts.")
+            await self.handle_failed_transaction(tx_signatures[token_address], token_address)
         return results
 
+    async def _get_signature_statuses(self, signatures: List[Signature]) -> List[Optional[TransactionStatus]]:
+        """
+        Fetch the statuses of any number of signatures, one RPC request per STATUS_BATCH_SIZE.
+
+        Args:
+            signatures: The transaction signatures to look up.
+
+        Returns:
+            List[Optional[TransactionStatus]]: Statuses in the same order, None for unknown signatures.
+        """
+        tx_statuses = []
+        for i in range(0, len(signatures), self.STATUS_BATCH_SIZE):
+            await self.rate_limiter.acquire()
+            response = await self.rpc_client.get_signature_statuses(signatures[i:i + self.STATUS_BATCH_SIZE])
+            tx_statuses.extend(response.value)
+        return tx_statuses
+
     async def handle_failed_transaction(self, tx_signature: str, token_address: str) -> None:
         """
         Handle a failed transaction by retrying or triggering a fallback mechanism.
@@ -96,12 +170,3 @@ class TxMonitor:
         """
         # Example: Integrate with a notification service (e.g., Slack, Telegram)
         logger.info(f"ALERT: {message}")
-
-    async def _enforce_rate_limit(self) -> None:
-        """
-        Ensures API calls respect the rate limit.
-        """
-        time_since_last_call = datetime.now() - self.last_api_call_time
-        if time_since_last_call < self.rate_limit_interval:
-            await asyncio.sleep((self.rate_limit_interval - time_since_last_call).total_seconds())
-        self.last_api_call_time = datetime.now()
\ No newline at end of file
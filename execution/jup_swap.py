@@ -1,6 +1,7 @@
 import asyncio
+import time
 import aiohttp
-from solana.rpc.async_api import AsyncClient
+from solana.rpc.types import TokenAccountOpts
 from solana.transaction import Transaction
 from solders.keypair import Keypair
 from solders.pubkey import Pubkey
@@ -9,56 +10,109 @@ from solders.rpc.config import RpcContextConfig
 from solders.transaction_status import TransactionConfirmationStatus
 from ..utils.logger import logger
 from ..utils.config import config
-from ..utils.helpers import check_enough_sol_balance
+from ..utils.helpers import SingleFlightCache, get_http_session, get_rpc_client, json_loads
+from ..utils.rate_limiter import TokenBucket
 import base64
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple
 
 
 class JupiterSwap:
+    SOL_MINT = "So11111111111111111111111111111111111111112"  # Wrapped SOL mint
+    BALANCE_TTL = 30  # Seconds a fetched wallet balance is trusted before querying the RPC again
+
     def __init__(self):
         self.private_key = config.WALLET_PRIVATE_KEY
-        self.solana_client = AsyncClient("https://api.mainnet-beta.solana.com")  # Use async client
+        self.solana_client = get_rpc_client()  # Shared async client, closed by close_rpc_client()
         self.slippage = config.SLIPPAGE_TOLERANCE or 0.5  # Default slippage tolerance
         self.jupiter_api_url = config.JUPITER_API_URL
         self.max_retries = 3  # Maximum number of retries for swap attempts
         self.retry_delay = 2  # Initial delay between retries in seconds
 
         # Rate limiting and caching
-        self.last_api_call_time = time.time()
-        self.api_call_interval = 1  # Rate limit: 1 call per second
-        self.quote_cache: Dict[str, Dict] = {}  # Cache for quotes
+        self.rate_limiter = TokenBucket(rate=1)  # Rate limit: 1 call per second
+        self.quote_cache = SingleFlightCache(maxsize=1024, ttl=2.0)  # (input_mint, output_mint, lamports) -> quote; quotes go stale within seconds
+        self._wallet_keypair: Optional[Keypair] = None  # Decoded on first use
+
+        # Wallet balance bookkeeping, so most swaps skip the getBalance round-trip
+        self._cached_balance: Optional[float] = None  # SOL balance at the last fetch
+        self._balance_fetch_time = 0.0  # time.monotonic() of the last fetch
+        self._pending_debit = 0.0  # SOL reserved by buys since the last fetch
 
     def _get_wallet_keypair(self) -> Keypair:
-        """Fetch wallet keypair from private key."""
-        return Keypair.from_base58_string(self.private_key)
+        """Fetch wallet keypair from private key, decoding it only once."""
+        if self._wallet_keypair is None:
+            self._wallet_keypair = Keypair.from_base58_string(self.private_key)
+        return self._wallet_keypair
 
     async def _get_quote(self, input_mint: str, output_mint: str, amount: float) -> Optional[Dict]:
-        """Fetch quote from Jupiter API with rate limiting and caching."""
-        cache_key = f"{input_mint}_{output_mint}_{amount}"
-        if cache_key in self.quote_cache:
-            return self.quote_cache[cache_key]
+        """Fetch quote from Jupiter API with rate limiting and caching.
 
-        # Rate limiting
-        time_since_last_call = time.time() - self.last_api_call_time
-        if time_since_last_call < self.api_call_interval:
-            await asyncio.sleep(self.api_call_interval - time_since_last_call)
-        self.last_api_call_time = time.time()
+        Concurrent requests for the same quote share one fetch, so only one of them goes to the network.
+        """
+        lamports = int(amount * 1e9)
 
-        try:
-            url = f"{self.jupiter_api_url}/quote?inputMint={input_mint}&outputMint={output_mint}&amount={int(amount * 1e9)}&slippageBps={int(self.slippage * 10000)}"
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=10) as response:
+        async def load() -> Optional[Dict]:
+            # Rate limiting
+            await self.rate_limiter.acquire()
+
+            try:
+                url = f"{self.jupiter_api_url}/quote?inputMint={input_mint}&outputMint={output_mint}&amount={lamports}&slippageBps={int(self.slippage * 10000)}"
+                session = get_http_session()
+                async with session.get(url) as response:
                     response.raise_for_status()
-                    data = await response.json()
-                    self.quote_cache[cache_key] = data  # Cache the result
-                    return data
-        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-            logger.error(f"Error fetching Jupiter quote: {e}")
-            return None
+                    return json_loads(await response.read())
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error(f"Error fetching Jupiter quote: {e}")
+                return None
+
+        return await self.quote_cache.get_or_load((input_mint, output_mint, lamports), load)
 
     async def _check_balance(self, wallet_address: str, amount: float) -> bool:
-        """Check if wallet has enough SOL balance for the swap."""
-        return check_enough_sol_balance(wallet_address, amount)
+        """Check if wallet has enough SOL balance for the swap, and reserve `amount` if it does.
+
+        Trusts the cached balance, less SOL reserved since it was fetched, for BALANCE_TTL
+        seconds. The RPC is only queried when that cache is stale or looks insufficient.
+        Reserving in the same step keeps concurrent buys from passing against the same balance;
+        callers release the reservation with _release_balance if the swap is never sent.
+        """
+        if (
+            self._cached_balance is not None
+            and time.monotonic() - self._balance_fetch_time < self.BALANCE_TTL
+            and self._cached_balance - self._pending_debit >= amount
+        ):
+            self._pending_debit += amount
+            return True
+
+        try:
+            balance_lamports = (await self.solana_client.get_balance(Pubkey.from_string(wallet_address))).value
+        except Exception as e:
+            logger.error(f"Error checking SOL balance for {wallet_address}: {e}")
+            return False
+
+        self._cached_balance = balance_lamports / 10**9  # Convert lamports to SOL
+        self._balance_fetch_time = time.monotonic()
+        self._pending_debit = 0.0
+        if self._cached_balance >= amount:
+            self._pending_debit = amount
+            return True
+        logger.warning(f"Insufficient SOL: Needed {amount}, Available {self._cached_balance}")
+        return False
+
+    def _release_balance(self, amount: float) -> None:
+        """Return SOL reserved by _check_balance for a swap that was never sent."""
+        self._pending_debit = max(self._pending_debit - amount, 0.0)
+
+    async def _get_token_balance(self, wallet_address: str, mint: str) -> Optional[float]:
+        """Return the wallet's balance of a token in base units / 1e9, the scale swap amounts use."""
+        try:
+            response = await self.solana_client.get_token_accounts_by_owner_json_parsed(
+                Pubkey.from_string(wallet_address), TokenAccountOpts(mint=Pubkey.from_string(mint))
+            )
+        except Exception as e:
+            logger.error(f"Error checking {mint} balance for {wallet_address}: {e}")
+            return None
+        base_units = sum(int(account.account.data.parsed["info"]["tokenAmount"]["amount"]) for account in response.value)
+        return base_units / 1e9
 
     async def confirm_transaction(self, tx_signature: str) -> bool:
         """
@@ -94,43 +148,66 @@ class JupiterSwap:
         logger.error(f"Failed to confirm transaction {tx_signature} after {self.max_retries} attempts.")
         return False
 
-    async def swap(self, input_mint: str, output_mint: str, amount: float) -> Optional[str]:
-        """Executes a token swap using Jupiter with retry logic."""
+    async def swap(self, input_mint: str, output_mint: str, amount: float) -> Optional[Tuple[str, float]]:
+        """
+        Executes a token swap using Jupiter with retry logic.
+
+        Amounts are in the token's base units / 1e9 (lamports / 1e9 = SOL for wrapped SOL).
+
+        Returns:
+            Optional[Tuple[str, float]]: The transaction signature and the amount of the output token
+            now held, or None if the swap failed. For tokens this is the wallet's balance read after
+            confirmation, since slippage usually fills below the quote; for SOL it is the route's
+            minimum output.
+        """
         wallet_keypair = self._get_wallet_keypair()
         wallet_address = str(wallet_keypair.pubkey())
 
-        if not await self._check_balance(wallet_address, amount):
+        # Only buys spend SOL; a sell's amount is in the input token, which the swap itself checks
+        spends_sol = input_mint == self.SOL_MINT
+        if spends_sol and not await self._check_balance(wallet_address, amount):
             logger.error("Insufficient SOL balance.")
             return None
 
-        for attempt in range(self.max_retries):
-            try:
-                # Step 1: Get Route
-                route_data = await self._get_quote(input_mint, output_mint, amount)
-                if not route_data or not route_data.get("data"):
-                    logger.error(f"No swap route found (Attempt {attempt + 1}/{self.max_retries}).")
-                    await asyncio.sleep(self.retry_delay * (attempt + 1))  # Exponential backoff
-                    continue
-
-                # Step 2: Prepare Transaction
-                swap_transaction = route_data["data"][0]["swapTransaction"]
-                transaction = Transaction.from_bytes(base64.b64decode(swap_transaction))
-
-                # Step 3: Sign and Send Transaction
-                transaction.sign(wallet_keypair)
-                tx_signature = await self.solana_client.send_raw_transaction(transaction.to_bytes())
-                logger.info(f"Swap executed. Transaction signature: {tx_signature}")
-
-                # Step 4: Confirm Transaction
-                confirmed = await self.confirm_transaction(tx_signature)
-                if confirmed:
-                    return tx_signature
-                else:
-                    logger.error(f"Transaction {tx_signature} not confirmed (Attempt {attempt + 1}/{self.max_retries}).")
+        sent = False  # Once a transaction is out, its SOL stays reserved until the next balance fetch
+        try:
+            for attempt in range(self.max_retries):
+                try:
+                    # Step 1: Get Route
+                    route_data = await self._get_quote(input_mint, output_mint, amount)
+                    if not route_data or not route_data.get("data"):
+                        logger.error(f"No swap route found (Attempt {attempt + 1}/{self.max_retries}).")
+                        await asyncio.sleep(self.retry_delay * (attempt + 1))  # Exponential backoff
+                        continue
+
+                    # Step 2: Prepare Transaction
+                    route = route_data["data"][0]
+                    swap_transaction = route["swapTransaction"]
+                    transaction = Transaction.from_bytes(base64.b64decode(swap_transaction))
+
+                    # Step 3: Sign and Send Transaction
+                    transaction.sign(wallet_keypair)
+                    tx_signature = await self.solana_client.send_raw_transaction(transaction.to_bytes())
+                    sent = True
+                    logger.info(f"Swap executed. Transaction signature: {tx_signature}")
+
+                    # Step 4: Confirm Transaction
+                    confirmed = await self.confirm_transaction(tx_signature)
+                    if confirmed:
+                        min_out_amount = int(route["otherAmountThreshold"]) / 1e9  # Quoted output less the slippage allowance
+                        if output_mint == self.SOL_MINT:
+                            return tx_signature, min_out_amount
+                        balance = await self._get_token_balance(wallet_address, output_mint)
+                        return tx_signature, balance if balance is not None else min_out_amount
+                    else:
+                        logger.error(f"Transaction {tx_signature} not confirmed (Attempt {attempt + 1}/{self.max_retries}).")
+                        await asyncio.sleep(self.retry_delay * (attempt + 1))  # Exponential backoff
+                except Exception as e:
+                    logger.error(f"Error executing swap (Attempt {attempt + 1}/{self.max_retries}): {e}")
                     await asyncio.sleep(self.retry_delay * (attempt + 1))  # Exponential backoff
-            except Exception as e:
-                logger.error(f"Error executing swap (Attempt {attempt + 1}/{self.max_retries}): {e}")
-                await asyncio.sleep(self.retry_delay * (attempt + 1))  # Exponential backoff
 
-        logger.error(f"Failed to swap {input_mint} to {output_mint} after {self.max_retries} attempts.")
-        return None
\ No newline at end of file
+            logger.error(f"Failed to swap {input_mint} to {output_mint} after {self.max_retries} attempts.")
+            return None
+        finally:
+            if spends_sol and not sent:
+                self._release_balance(amount)
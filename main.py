@@ -7,6 +7,11 @@ from typing import List
 from core.bot import TradingBot
 from utils.logger import logger
 
+try:
+    import uvloop
+except ImportError:  # uvloop is optional; the default asyncio event loop is used instead
+    uvloop = None
+
 
 async def main():
     """Main function to initialize and run the trading bot."""
@@ -14,7 +19,7 @@ async def main():
         # Fetch token addresses from environment variable or use defaults
         token_addresses = os.getenv(
             "TOKENS_TO_TRADE",
-            "So1111111111111111111111111111111111111112,EPjFWdd5AufqALUs2vW0ouAZnuuzqvTZcztBbuw61zPX",
+            f"{TradingBot.SOL_ADDRESS},EPjFWdd5AufqALUs2vW0ouAZnuuzqvTZcztBbuw61zPX",
         ).split(",")
 
         logger.info(f"Starting bot with token addresses: {token_addresses}")
@@ -22,22 +27,33 @@ async def main():
         # Initialize the trading bot
         bot = TradingBot()
 
-        # Handle graceful shutdown
-        def handle_shutdown(signal, frame):
+        # Handle graceful shutdown: cancelling the main task lets the trading loop's cleanup
+        # (saving the Q-table, closing connections) run to completion before the process exits
+        main_task = asyncio.current_task()
+
+        def handle_shutdown():
             logger.info("Shutting down the bot gracefully...")
-            asyncio.create_task(bot.shutdown())
-            sys.exit(0)
+            main_task.cancel()
 
-        signal.signal(signal.SIGINT, handle_shutdown)
-        signal.signal(signal.SIGTERM, handle_shutdown)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, handle_shutdown)
+            except NotImplementedError:  # Not available on Windows, where Ctrl+C still unwinds through the same cleanup
+                pass
 
         # Start the trading loop
         await bot.trade_loop(token_addresses)
 
+    except asyncio.CancelledError:
+        logger.info("Bot stopped.")
     except Exception as e:
         logger.error(f"Bot initialization error: {e}", exc_info=True)
         sys.exit(1)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if uvloop:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
\ No newline at end of file
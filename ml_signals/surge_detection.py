@@ -1,110 +1,138 @@
 import asyncio
-from typing import Optional, Dict, List
-from datetime import datetime, timedelta
-from functools import lru_cache
+from typing import AsyncIterator, Optional, Dict, List, Tuple
 
 from ..data_acquisition.social_scraper import SocialScraper
 from ..data_acquisition.realtime_prices import PriceFetcher
+from ..strategy.momentum_scalping import TokenSignals
+from ..utils.helpers import tweet_query
 from ..utils.logger import logger
+from ..utils.rate_limiter import TokenBucket
 
 
 class SurgeDetector:
-    def __init__(self, surge_volume_threshold: int = 200, surge_sentiment_threshold: float = 0.7):
-        self.social_scraper = SocialScraper()
-        self.price_fetcher = PriceFetcher()
+    def __init__(self, surge_volume_threshold: int = 200, surge_sentiment_threshold: float = 0.7,
+                 price_fetcher: Optional[PriceFetcher] = None, social_scraper: Optional[SocialScraper] = None):
+        # TradingBot hands in the same fetcher and scraper it gives MomentumScalper
+        self.social_scraper = social_scraper or SocialScraper()
+        self.price_fetcher = price_fetcher or PriceFetcher()
         self.surge_volume_threshold = surge_volume_threshold
         self.surge_sentiment_threshold = surge_sentiment_threshold
 
-        # Rate limiting and caching
-        self.last_api_call_time = datetime.now()
-        self.api_call_interval = timedelta(seconds=1)  # Rate limit: 1 call per second
-        self.price_cache: Dict[str, Tuple[Dict, datetime]] = {}  # token_address -> (price_data, timestamp)
-        self.social_cache: Dict[str, Tuple[List[str], datetime]] = {}  # token_address -> (tweets, timestamp)
-
-    @lru_cache(maxsize=128)
-    async def fetch_price_data(self, token_address: str) -> Optional[Dict]:
-        """Fetches real-time price data for the token with caching."""
-        if token_address in self.price_cache:
-            price_data, timestamp = self.price_cache[token_address]
-            if datetime.now() - timestamp < timedelta(seconds=60):  # Cache TTL: 60 seconds
-                return price_data
-
         # Rate limiting
-        time_since_last_call = datetime.now() - self.last_api_call_time
-        if time_since_last_call < self.api_call_interval:
-            await asyncio.sleep((self.api_call_interval - time_since_last_call).total_seconds())
-        self.last_api_call_time = datetime.now()
+        self.rate_limiter = TokenBucket(rate=1, capacity=5)  # Rate limit: 1 call per second, bursts of 5
+        self.token_symbols: Dict[str, str] = {}  # token_address -> base token symbol
 
+    async def fetch_price_data(self, token_address: str) -> Optional[Dict]:
+        """Fetches real-time price data for the token through the shared PriceFetcher cache."""
         price_data = await self.price_fetcher.get_price_dexscreener(token_address)
         if not price_data:
             logger.warning(f"Price data not available for {token_address}.")
-            return None
-
-        # Update cache
-        self.price_cache[token_address] = (price_data, datetime.now())
         return price_data
 
-    @lru_cache(maxsize=128)
-    async def fetch_social_data(self, token_symbol: str, token_address: str, num_tweets: int = 150) -> List[str]:
-        """Scrapes social media data for the token with caching."""
-        cache_key = f"{token_symbol}_{token_address}"
-        if cache_key in self.social_cache:
-            tweets, timestamp = self.social_cache[cache_key]
-            if datetime.now() - timestamp < timedelta(seconds=60):  # Cache TTL: 60 seconds
-                return tweets
-
-        # Rate limiting
-        time_since_last_call = datetime.now() - self.last_api_call_time
-        if time_since_last_call < self.api_call_interval:
-            await asyncio.sleep((self.api_call_interval - time_since_last_call).total_seconds())
-        self.last_api_call_time = datetime.now()
-
-        query = f"{token_symbol} OR {token_address}"
-        tweets = await self.social_scraper.scrape_twitter(query, num_tweets=num_tweets)
-        if not tweets:
-            logger.info(f"No social data found for {token_symbol} ({token_address}).")
-            return []
-
-        # Update cache
-        self.social_cache[cache_key] = (tweets, datetime.now())
-        return tweets
-
     async def analyze_social_sentiment(self, tweets: List[str]) -> float:
         """Analyzes the sentiment of scraped social media data."""
         if not tweets:
             return 0.0
-        return await self.social_scraper.get_overall_sentiment(tweets)
+        return await asyncio.to_thread(self.social_scraper.get_overall_sentiment, tweets)
 
-    async def detect_surge_potential(self, token_address: str) -> bool:
-        """Detects the potential for a token price surge based on social and market data."""
-        try:
-            price_data = await self.fetch_price_data(token_address)
-            if not price_data:
-                return False
+    async def detect_social_surge(self, token_address: str, num_tweets: Optional[int] = None) -> bool:
+        """
+        Checks the social side of a surge: enough tweets with a high enough average sentiment.
 
-            token_symbol = price_data["base_token_symbol"]
-            tweets = await self.fetch_social_data(token_symbol, token_address)
+        Up to num_tweets tweets are read, by default the surge volume threshold. Tweets are scored
+        as they stream in. After each chunk the final average is bounded by assuming every tweet
+        still to come is fully positive or fully negative, and scraping stops as soon as either
+        bound settles the outcome.
+        """
+        if num_tweets is None:
+            num_tweets = self.surge_volume_threshold
+        if num_tweets < self.surge_volume_threshold:
+            return False  # Not enough tweets requested to ever reach the volume threshold
 
-            if not tweets:
-                return False
+        token_symbol = self.token_symbols[token_address]
 
-            overall_sentiment = await self.analyze_social_sentiment(tweets)
-            tweet_count = len(tweets)
+        # Rate limiting
+        await self.rate_limiter.acquire()
+
+        tweet_count = 0
+        sentiment_sum = 0.0
+        async for chunk in self.social_scraper.stream_twitter(tweet_query(token_symbol, token_address), max_tweets=num_tweets):
+            tweet_count += len(chunk)
+            sentiment_sum += await self.analyze_social_sentiment(chunk) * len(chunk)
+
+            best_case = (sentiment_sum + num_tweets - tweet_count) / num_tweets
+            worst_case = sentiment_sum / num_tweets
+            if best_case < self.surge_sentiment_threshold:
+                break
+            if tweet_count >= self.surge_volume_threshold and worst_case >= self.surge_sentiment_threshold:
+                logger.debug("Surge Detection: %s | Tweets: %d+ | Sentiment: %.3f", token_symbol, tweet_count, sentiment_sum / tweet_count)
+                return True
+
+        # The stream ran out (or stopped early on a hopeless bound): judge the tweets actually seen
+        overall_sentiment = sentiment_sum / max(tweet_count, 1)
+        logger.debug("Surge Detection: %s | Tweets: %d | Sentiment: %.3f", token_symbol, tweet_count, overall_sentiment)
+        return tweet_count >= self.surge_volume_threshold and overall_sentiment >= self.surge_sentiment_threshold
+
+    def is_surge(self, signals: TokenSignals) -> bool:
+        """Applies detect_surge_potential's criteria to signals from MomentumScalper.evaluate."""
+        return signals.tweet_count >= self.surge_volume_threshold and signals.sentiment >= self.surge_sentiment_threshold
+
+    async def detect_surge_potential(self, token_address: str) -> bool:
+        """
+        Detects the potential for a token price surge based on social and market data.
 
-            logger.info(f"Surge Detection: {token_symbol} | Tweets: {tweet_count} | Sentiment: {overall_sentiment}")
+        A token's first check fetches price data before the social check, which needs its symbol;
+        later checks run both concurrently.
+        """
+        try:
+            if token_address in self.token_symbols:
+                price_data, social_surge = await asyncio.gather(
+                    self.fetch_price_data(token_address),
+                    self.detect_social_surge(token_address),
+                )
+            else:
+                price_data = await self.fetch_price_data(token_address)
+                if not price_data:
+                    return False
+                self.token_symbols[token_address] = price_data["base_token_symbol"]
+                social_surge = await self.detect_social_surge(token_address)
 
             # Surge detection criteria
-            if tweet_count >= self.surge_volume_threshold and overall_sentiment >= self.surge_sentiment_threshold:
-                logger.info(f"Surge potential detected for {token_address}.")
+            if price_data and social_surge:
+                logger.info("Surge potential detected for %s.", token_address)
                 return True
 
-            logger.info(f"No surge potential for {token_address}.")
+            logger.debug("No surge potential for %s.", token_address)
             return False
 
         except Exception as e:
             logger.error(f"Error detecting surge potential for {token_address}: {e}")
             return False
 
+    async def scan(self, token_addresses: List[str], concurrency: int = 16) -> AsyncIterator[str]:
+        """
+        Yields the tokens with surge potential as soon as each one is confirmed.
+
+        Up to `concurrency` tokens are checked at once, so a caller can act on the first hit
+        while the rest of the watchlist is still being scanned.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def detect(token_address: str) -> Tuple[str, bool]:
+            async with semaphore:
+                return token_address, await self.detect_surge_potential(token_address)
+
+        tasks = [asyncio.ensure_future(detect(token_address)) for token_address in token_addresses]
+        try:
+            for future in asyncio.as_completed(tasks):
+                token_address, surging = await future
+                if surging:
+                    yield token_address
+        finally:
+            # A caller that stops iterating early (or is cancelled) must not leave checks running
+            for task in tasks:
+                task.cancel()
+
 
 # Example Usage
 async def main():
@@ -1,69 +1,113 @@
 import asyncio
-from typing import Optional, Dict, List
-from datetime import datetime, timedelta
-from functools import lru_cache
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Tuple
 
+import numpy as np
 import talib  # Import TA-Lib for technical analysis
+
 from ..data_acquisition.realtime_prices import PriceFetcher
 from ..data_acquisition.social_scraper import SocialScraper
+from ..utils.helpers import SingleFlightCache, njit, tweet_query
 from ..utils.logger import logger
+from ..utils.rate_limiter import TokenBucket
 from ..utils.config import config
 
 
+@njit(cache=True, fastmath=True)
+def _atr_wilder(high: np.ndarray, low: np.ndarray, close: np.ndarray, start: int, atr: float, period: int) -> float:
+    """Advance a Wilder-smoothed ATR over the bars from `start` onwards, given the ATR up to `start - 1`."""
+    for i in range(start, close.shape[0]):
+        true_range = max(high[i] - low[i], abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1]))
+        atr = (atr * (period - 1) + true_range) / period
+    return atr
+
+
+@dataclass
+class TokenSignals:
+    """Market and social data for one token, fetched and scored once for every signal check."""
+    price_data: Dict
+    tweet_count: int
+    sentiment: float  # Average positivity of the tweets, from 0 to 1
+
+
 class MomentumScalper:
-    def __init__(self):
-        self.price_fetcher = PriceFetcher()
-        self.social_scraper = SocialScraper()
+    CACHE_SIZE = 1024  # Tokens kept in the social cache
+    CACHE_TTL = 60  # Seconds before cached social data is refetched
+
+    def __init__(self, price_fetcher: Optional[PriceFetcher] = None, social_scraper: Optional[SocialScraper] = None):
+        # Pass shared instances to reuse their caches and rate limiters across components
+        self.price_fetcher = price_fetcher or PriceFetcher()
+        self.social_scraper = social_scraper or SocialScraper()
         self.profit_threshold_normal = config.PROFIT_THRESHOLD_NORMAL
         self.jupiter_api_url = config.JUPITER_API_URL  # Use Jupiter API URL from config
 
         # Rate limiting and caching
-        self.last_api_call_time = datetime.now()
-        self.api_call_interval = timedelta(seconds=1)  # Rate limit: 1 call per second
-        self.price_cache: Dict[str, Tuple[Dict, datetime]] = {}  # token_address -> (price_data, timestamp)
-        self.social_cache: Dict[str, Tuple[List[str], datetime]] = {}  # token_address -> (tweets, timestamp)
+        self.rate_limiter = TokenBucket(rate=1, capacity=5)  # Rate limit: 1 call per second, bursts of 5
+        self.social_cache = SingleFlightCache(maxsize=self.CACHE_SIZE, ttl=self.CACHE_TTL)  # (token_address, num_tweets) -> tweets
+        self.token_symbols: Dict[str, str] = {}  # token_address -> base token symbol
+        self._atr_state: Dict[Tuple[str, int], Tuple[float, float]] = {}  # (token_address, period) -> (atr, timestamp of the last bar folded in)
 
-    @lru_cache(maxsize=128)
     async def fetch_price_data(self, token_address: str) -> Optional[Dict]:
-        """Fetches real-time price data for the token with caching."""
-        if token_address in self.price_cache:
-            price_data, timestamp = self.price_cache[token_address]
-            if datetime.now() - timestamp < timedelta(seconds=60):  # Cache TTL: 60 seconds
-                return price_data
-
-        # Rate limiting
-        await self._enforce_rate_limit()
-
+        """Fetches real-time price data for the token through the shared PriceFetcher cache."""
         price_data = await self.price_fetcher.get_price_dexscreener(token_address)
         if not price_data:
             logger.warning(f"Price data not available for {token_address}. Skipping buy signal check.")
-            return None
-
-        # Update cache
-        self.price_cache[token_address] = (price_data, datetime.now())
         return price_data
 
-    @lru_cache(maxsize=128)
-    async def fetch_social_data(self, token_symbol: str, token_address: str, num_tweets: int = 50) -> List[str]:
+    async def fetch_social_data(self, token_address: str, num_tweets: int = 50) -> List[str]:
         """Scrapes social media data for the token with caching."""
-        cache_key = f"{token_symbol}_{token_address}"
-        if cache_key in self.social_cache:
-            tweets, timestamp = self.social_cache[cache_key]
-            if datetime.now() - timestamp < timedelta(seconds=60):  # Cache TTL: 60 seconds
-                return tweets
+        async def load() -> List[str]:
+            # Rate limiting
+            await self.rate_limiter.acquire()
+
+            query = tweet_query(self.token_symbols[token_address], token_address)
+            tweets = await self.social_scraper.scrape_twitter(query, num_tweets=num_tweets)
+            if not tweets:
+                logger.debug("No social data found for %s (%s).", self.token_symbols[token_address], token_address)
+                return []
+            return tweets
+
+        return await self.social_cache.get_or_load((token_address, num_tweets), load)
+
+    async def fetch_price_and_social_data(self, token_address: str, num_tweets: int = 50) -> Tuple[Optional[Dict], List[str]]:
+        """
+        Fetches price data and social data for the token.
+
+        The tweet query needs the token symbol, which is only known from price data. Symbols don't
+        change, so once a token's symbol has been seen the two requests are issued concurrently.
+        """
+        if token_address in self.token_symbols:
+            return await asyncio.gather(
+                self.fetch_price_data(token_address),
+                self.fetch_social_data(token_address, num_tweets),
+            )
 
-        # Rate limiting
-        await self._enforce_rate_limit()
+        price_data = await self.fetch_price_data(token_address)
+        if not price_data:
+            return None, []
+        self.token_symbols[token_address] = price_data["base_token_symbol"]
+        return price_data, await self.fetch_social_data(token_address, num_tweets)
+
+    async def evaluate(self, token_address: str, num_tweets: int = 150) -> Optional[TokenSignals]:
+        """
+        Fetches and scores a token's data once, for callers that run several signal checks on it.
+
+        Pass the result to is_buy here and SurgeDetector.is_surge, instead of calling
+        check_buy_signal and detect_surge_potential, which would each fetch and score the token.
 
-        query = f"{token_symbol} OR {token_address}"
-        tweets = await self.social_scraper.scrape_twitter(query, num_tweets=num_tweets)
-        if not tweets:
-            logger.info(f"No social data found for {token_symbol} ({token_address}).")
-            return []
+        Returns:
+            Optional[TokenSignals]: The token's signals, or None if no price data is available.
+        """
+        price_data, tweets = await self.fetch_price_and_social_data(token_address, num_tweets)
+        if not price_data:
+            return None
+        sentiment = await asyncio.to_thread(self.social_scraper.get_overall_sentiment, tweets) if tweets else 0.0
+        return TokenSignals(price_data=price_data, tweet_count=len(tweets), sentiment=sentiment)
 
-        # Update cache
-        self.social_cache[cache_key] = (tweets, datetime.now())
-        return tweets
+    @staticmethod
+    def is_buy(signals: TokenSignals, social_volume_threshold: int = 5, sentiment_threshold: float = 0.6) -> bool:
+        """Applies check_buy_signal's criteria to already evaluated signals."""
+        return signals.tweet_count >= social_volume_threshold and signals.sentiment >= sentiment_threshold
 
     async def check_buy_signal(self, token_address: str, social_volume_threshold: int = 5, sentiment_threshold: float = 0.6) -> bool:
         """
@@ -78,7 +122,7 @@ class MomentumScalper:
             bool: True if a buy signal is detected, False otherwise.
         """
         try:
-            price_data = await self.fetch_price_data(token_address)
+            price_data, tweets = await self.fetch_price_and_social_data(token_address)
             if not price_data:
                 logger.warning(f"No price data available for {token_address}. Skipping buy signal check.")
                 return False
@@ -87,19 +131,22 @@ class MomentumScalper:
             current_price = price_data["price_usd"]
 
             # Social volume and sentiment check
-            token_symbol = price_data["base_token_symbol"]
-            tweets = await self.fetch_social_data(token_symbol, token_address)
             if tweets:
-                overall_sentiment = await self.social_scraper.get_overall_sentiment(tweets)
-                logger.info(f"Sentiment Score: {overall_sentiment}, Sentiment Threshold: {sentiment_threshold}")
-                if len(tweets) >= social_volume_threshold and overall_sentiment >= sentiment_threshold:
-                    logger.info(f"Buy signal detected for {token_address}: Positive sentiment and sufficient social volume.")
+                # Check volume first; sentiment scoring is the expensive part
+                if len(tweets) < social_volume_threshold:
+                    logger.debug("No buy signal for %s: Insufficient social volume (%d tweets).", token_address, len(tweets))
+                    return False
+
+                overall_sentiment = await asyncio.to_thread(self.social_scraper.get_overall_sentiment, tweets)
+                logger.debug("Sentiment Score: %.3f, Sentiment Threshold: %s", overall_sentiment, sentiment_threshold)
+                if overall_sentiment >= sentiment_threshold:
+                    logger.info("Buy signal detected for %s: Positive sentiment and sufficient social volume.", token_address)
                     return True
                 else:
-                    logger.info(f"No buy signal: Insufficient social volume or negative sentiment.")
+                    logger.debug("No buy signal for %s: Negative sentiment.", token_address)
                     return False
             else:
-                logger.info("No tweets found for token. Skipping social volume/sentiment check.")
+                logger.debug("No tweets found for %s. Skipping social volume/sentiment check.", token_address)
                 return False
 
         except Exception as e:
@@ -120,10 +167,10 @@ class MomentumScalper:
         """
         try:
             profit = (current_price - entry_price) / entry_price
-            logger.info(f"Current Profit: {profit}, Normal Threshold: {self.profit_threshold_normal}")
+            logger.debug("Current Profit: %.4f, Normal Threshold: %s", profit, self.profit_threshold_normal)
 
             if surge_potential:
-                logger.info(f"Surge potential detected. Holding token for now...")
+                logger.debug("Surge potential detected. Holding token for now...")
                 return False  # Hold if surge potential is detected
             elif profit >= self.profit_threshold_normal:
                 logger.info("Sell signal triggered: Profit threshold reached.")
@@ -143,21 +190,46 @@ class MomentumScalper:
         logger.info(f"Fetching historical price for {token_address}, {time_ago} ago.")
         return None
 
-    async def calculate_atr_stop_loss(self, historical_prices: Dict[str, List[float]], current_price: float, atr_period: int = 14, atr_multiplier: int = 2) -> Optional[float]:
+    async def calculate_atr_stop_loss(self, historical_prices: Dict[str, List[float]], current_price: float, atr_period: int = 14, atr_multiplier: int = 2, token_address: Optional[str] = None) -> Optional[float]:
         """
         Calculates a dynamic stop-loss based on Average True Range (ATR).
+
+        When a token address and bar timestamps are given, the ATR is kept per token: the first call
+        bootstraps it with TA-Lib, and later calls only fold in the bars newer than the last one seen.
+        This works for growing histories and fixed-length rolling windows alike, as long as the last
+        bar seen is still in the window; otherwise the ATR is recomputed in full.
         
         Args:
-            historical_prices (dict): Dictionary of high, low, and close prices.
+            historical_prices (dict): Dictionary of high, low, and close prices, plus optionally
+                the ascending bar timestamps under 'timestamp'.
             current_price (float): The current price of the token.
             atr_period (int): Period for ATR calculation (default: 14).
             atr_multiplier (int): Multiplier for ATR to set stop-loss (default: 2).
+            token_address (str): Token the prices belong to, used to update its ATR incrementally.
         
         Returns:
             float: Calculated stop-loss price.
         """
         try:
-            atr = talib.ATR(historical_prices['high'], historical_prices['low'], historical_prices['close'], timeperiod=atr_period)[-1]
+            high = np.asarray(historical_prices['high'], dtype=np.float64)
+            low = np.asarray(historical_prices['low'], dtype=np.float64)
+            close = np.asarray(historical_prices['close'], dtype=np.float64)
+
+            timestamps = historical_prices.get('timestamp')
+            incremental = token_address is not None and timestamps is not None and len(timestamps) > 0
+            atr = None
+            if incremental:
+                timestamps = np.asarray(timestamps, dtype=np.float64)
+                state = self._atr_state.get((token_address, atr_period))
+                if state:
+                    start = int(np.searchsorted(timestamps, state[1], side='right'))  # First bar not yet folded in
+                    if start > 0 and timestamps[start - 1] == state[1]:
+                        atr = _atr_wilder(high, low, close, start, state[0], atr_period)
+            if atr is None:
+                atr = talib.ATR(high, low, close, timeperiod=atr_period)[-1]
+            if incremental and not np.isnan(atr):
+                self._atr_state[(token_address, atr_period)] = (atr, timestamps[-1])
+
             stop_loss = current_price - (atr_multiplier * atr)
             return stop_loss
 
@@ -165,15 +237,6 @@ class MomentumScalper:
             logger.error(f"Error calculating ATR stop loss: {e}")
             return None
 
-    async def _enforce_rate_limit(self) -> None:
-        """
-        Ensures API calls respect the rate limit.
-        """
-        time_since_last_call = datetime.now() - self.last_api_call_time
-        if time_since_last_call < self.api_call_interval:
-            await asyncio.sleep((self.api_call_interval - time_since_last_call).total_seconds())
-        self.last_api_call_time = datetime.now()
-
 
 # Example usage
 async def main():
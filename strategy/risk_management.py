@@ -1,7 +1,8 @@
 import asyncio
+import time
 from typing import Optional
-from datetime import datetime, timedelta
-from functools import lru_cache
+
+import numpy as np
 
 from ..utils.logger import logger
 from ..utils.config import config
@@ -9,63 +10,98 @@ from ..utils.helpers import get_solana_price_usd
 
 
 class RiskManager:
+    SOL_PRICE_RETRY_DELAYS = (0, 0.05, 0.15)  # Seconds to wait before each SOL price fetch attempt
+    SOL_PRICE_COOLDOWN = 30  # Seconds to serve the last known SOL price after every attempt failed
+
     def __init__(self):
         self.stop_loss_percentage = config.STOP_LOSS_PERCENTAGE
+        self._sl_factor = 1.0 - self.stop_loss_percentage  # Stop-loss price as a fraction of the entry price
+        self.sol_price: Optional[float] = None  # Last SOL price fetched successfully
+        self._sol_price_refresh: Optional[asyncio.Task] = None  # Refresh in flight, shared by concurrent callers
+        self._sol_price_retry_at = 0.0  # Monotonic time before which failed fetches aren't retried
         self.initial_investment_usd = config.INITIAL_INVESTMENT_USD
 
-        # Rate limiting and caching
-        self.last_price_fetch_time = datetime.now()
-        self.price_fetch_interval = timedelta(seconds=60)  # Cache SOL price for 60 seconds
-        self.sol_price_cache: Optional[float] = None
-
-    @lru_cache(maxsize=1)
-    async def get_solana_price(self) -> Optional[float]:
-        """Fetches the current SOL price with caching and rate limiting."""
-        if self.sol_price_cache and datetime.now() - self.last_price_fetch_time < self.price_fetch_interval:
-            return self.sol_price_cache
-
-        try:
-            sol_price = await get_solana_price_usd()
-            if not sol_price:
-                logger.error("Could not fetch SOL price. Using a default SOL price of $20.")
-                sol_price = 20  # Default price
-
-            # Update cache
-            self.sol_price_cache = sol_price
-            self.last_price_fetch_time = datetime.now()
-            return sol_price
-        except Exception as e:
-            logger.error(f"Error fetching SOL price: {e}")
-            return None
-
-    async def calculate_position_size(self, risk_percentage: float = 0.02) -> float:
+    async def calculate_position_size(self, risk_percentage: float = 0.02, *, allow_stale: bool = False) -> float:
         """
         Calculates the position size based on risk percentage and SOL price.
 
         Args:
             risk_percentage (float): The percentage of the initial investment to risk on a single trade.
+            allow_stale (bool): Use the last known SOL price instead of waiting on the network and
+                refresh it in the background. The price is then at most one refresh behind, about
+                a minute plus the time the refresh takes.
 
         Returns:
             float: The amount of SOL to buy for the position.
         """
         try:
-            sol_price = await self.get_solana_price()
-            if not sol_price:
-                logger.error("Could not fetch SOL price. Using a default SOL price of $20.")
-                sol_price = 20  # Default price
-
             # Amount to risk on trade
             risk_amount_usd = self.initial_investment_usd * risk_percentage
+            if not risk_amount_usd:
+                return 0.0
+
+            sol_price = await self._get_sol_price(allow_stale)
+
             # Amount of SOL to buy
             sol_to_buy = risk_amount_usd / sol_price
-            logger.info(f"Calculated position size: Risking ${risk_amount_usd:.2f} to buy {sol_to_buy:.4f} SOL (SOL price: ${sol_price:.2f})")
+            logger.info("Calculated position size: Risking $%.2f to buy %.4f SOL (SOL price: $%.2f)", risk_amount_usd, sol_to_buy, sol_price)
             return sol_to_buy
 
         except Exception as e:
-            logger.error(f"Error calculating position size: {e}")
+            logger.error("Error calculating position size: %s", e)
             return 0.0
 
-    async def calculate_stop_loss_price(self, entry_price: float) -> float:
+    async def _get_sol_price(self, allow_stale: bool) -> float:
+        """
+        Returns the SOL price, serving the last known one and refreshing it in the background if allowed.
+
+        If fetching fails, the last known price is used and fetches are paused for SOL_PRICE_COOLDOWN
+        seconds. Raises RuntimeError if no price has ever been fetched, so no trade is sized blindly.
+        """
+        if self.sol_price is not None:
+            if allow_stale:
+                self._start_sol_price_refresh()
+                return self.sol_price
+            if time.monotonic() < self._sol_price_retry_at:
+                return self.sol_price
+
+        # Shielded so a cancelled caller doesn't cancel the refresh other callers are awaiting
+        sol_price = await asyncio.shield(self._start_sol_price_refresh())
+        if sol_price:
+            return sol_price
+        if self.sol_price is None:
+            raise RuntimeError("SOL price unavailable and no earlier price to fall back on.")
+        logger.warning("Using last known SOL price: $%.2f", self.sol_price)
+        return self.sol_price
+
+    def _start_sol_price_refresh(self) -> asyncio.Task:
+        """Returns the SOL price refresh in flight, starting one if there is none."""
+        if self._sol_price_refresh is None or self._sol_price_refresh.done():
+            self._sol_price_refresh = asyncio.create_task(self._refresh_sol_price())
+        return self._sol_price_refresh
+
+    async def _refresh_sol_price(self) -> Optional[float]:
+        """Fetches the SOL price (cached for about a minute), retrying briefly, and remembers it if a fetch succeeded."""
+        if time.monotonic() < self._sol_price_retry_at:
+            return None
+
+        for delay in self.SOL_PRICE_RETRY_DELAYS:
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                sol_price = await get_solana_price_usd()
+            except Exception as e:
+                logger.error("Error fetching SOL price: %s", e)
+                continue
+            if sol_price:
+                self.sol_price = sol_price
+                self._sol_price_retry_at = 0.0
+                return sol_price
+
+        self._sol_price_retry_at = time.monotonic() + self.SOL_PRICE_COOLDOWN
+        return None
+
+    def calculate_stop_loss_price(self, entry_price: float) -> float:
         """
         Calculates the stop-loss price based on the entry price and stop-loss percentage.
 
@@ -75,13 +111,9 @@ class RiskManager:
         Returns:
             float: The stop-loss price.
         """
-        try:
-            stop_loss_price = entry_price * (1 - self.stop_loss_percentage)
-            logger.info(f"Calculated stop-loss price: {stop_loss_price:.6f} (Entry price: {entry_price:.6f}, Stop-loss percentage: {self.stop_loss_percentage})")
-            return stop_loss_price
-        except Exception as e:
-            logger.error(f"Error calculating stop-loss price: {e}")
-            return 0.0
+        stop_loss_price = entry_price * self._sl_factor
+        logger.info("Calculated stop-loss price: %.6f (Entry price: %.6f, Stop-loss percentage: %s)", stop_loss_price, entry_price, self.stop_loss_percentage)
+        return stop_loss_price
 
     def check_stop_loss(self, current_price: float, stop_loss_price: float) -> bool:
         """
@@ -100,6 +132,20 @@ class RiskManager:
         else:
             return False
 
+    @staticmethod
+    def check_stop_loss_batch(current_prices: np.ndarray, stop_loss_prices: np.ndarray) -> np.ndarray:
+        """
+        Checks the stop-loss for many positions in one vectorised comparison.
+
+        Args:
+            current_prices (np.ndarray): Current prices of the positions' tokens.
+            stop_loss_prices (np.ndarray): Stop-loss prices of the same positions.
+
+        Returns:
+            np.ndarray: Boolean mask of positions whose stop-loss has been triggered.
+        """
+        return np.less_equal(current_prices, stop_loss_prices)
+
 
 # Example Usage
 async def main():
@@ -110,7 +156,7 @@ async def main():
     print(f"Position size: {position_size} SOL")
 
     entry_price = 0.001234  # Example entry price
-    stop_loss_price = await risk_manager.calculate_stop_loss_price(entry_price)
+    stop_loss_price = risk_manager.calculate_stop_loss_price(entry_price)
     print(f"Stop-loss price: {stop_loss_price}")
 
     current_price = 0.0011  # Example current price
@@ -1,79 +1,68 @@
 import os
+from dataclasses import dataclass
 from dotenv import load_dotenv
-from typing import Optional, Union
-from functools import lru_cache
+from typing import Optional
 
 
+@dataclass(frozen=True)
 class Config:
-    def __init__(self):
-        """Initialize configuration by loading environment variables from .env file."""
-        load_dotenv()  # Load environment variables from .env file
-        self._validate_required_keys()
+    """
+    Bot configuration, read from environment variables once at import.
 
-    def _validate_required_keys(self) -> None:
-        """Validate that all required environment variables are set."""
-        required_keys = ["WALLET_PRIVATE_KEY"]
-        for key in required_keys:
-            if not os.getenv(key):
-                raise ValueError(f"Required environment variable '{key}' is not set in the .env file.")
+    Values are plain attributes, so hot paths reading e.g. `config.STOP_LOSS_PERCENTAGE`
+    pay a single attribute lookup instead of a getter call.
+    """
+    WALLET_PRIVATE_KEY: str
+    SLIPPAGE_TOLERANCE: float
+    PROFIT_THRESHOLD_NORMAL: float
+    STOP_LOSS_PERCENTAGE: float
+    INITIAL_INVESTMENT_USD: float
+    DEXSCREENER_API_KEY: Optional[str]
+    JUPITER_API_URL: str
+    SOLANA_RPC_URL: str
+    LOG_LEVEL: str
+    SLEEP_INTERVAL: int  # Seconds between trading cycles
 
-    @lru_cache(maxsize=1)
-    def get_wallet_private_key(self) -> str:
-        """Get the wallet private key from environment variables."""
-        return os.getenv("WALLET_PRIVATE_KEY")
 
-    @lru_cache(maxsize=1)
-    def get_slippage_tolerance(self) -> float:
-        """Get the slippage tolerance from environment variables with a default fallback."""
-        return float(os.getenv("SLIPPAGE_TOLERANCE", 0.005))  # 0.5% default
+def _validate_required_keys() -> None:
+    """Validate that all required environment variables are set."""
+    required_keys = ["WALLET_PRIVATE_KEY"]
+    env = os.environ
+    missing = [key for key in required_keys if not env.get(key)]
+    if missing:
+        raise ValueError(f"Required environment variables not set in the .env file: {', '.join(missing)}")
 
-    @lru_cache(maxsize=1)
-    def get_profit_threshold_normal(self) -> float:
-        """Get the profit threshold from environment variables with a default fallback."""
-        return float(os.getenv("PROFIT_THRESHOLD_NORMAL", 0.45))  # 45% default
 
-    @lru_cache(maxsize=1)
-    def get_stop_loss_percentage(self) -> float:
-        """Get the stop-loss percentage from environment variables with a default fallback."""
-        return float(os.getenv("STOP_LOSS_PERCENTAGE", 0.10))  # 10% default
-
-    @lru_cache(maxsize=1)
-    def get_initial_investment_usd(self) -> float:
-        """Get the initial investment amount in USD from environment variables with a default fallback."""
-        return float(os.getenv("INITIAL_INVESTMENT_USD", 100))  # USD default
-
-    @lru_cache(maxsize=1)
-    def get_dexscreener_api_key(self) -> Optional[str]:
-        """Get the DEX Screener API key from environment variables."""
-        return os.getenv("DEXSCREENER_API_KEY")
-
-    @lru_cache(maxsize=1)
-    def get_jupiter_api_url(self) -> str:
-        """Get the Jupiter API URL from environment variables with a default fallback."""
-        return os.getenv("JUPITER_API_URL", "https://quote-api.jup.ag/v6")  # Jupiter API default
-
-    @lru_cache(maxsize=1)
-    def get_log_level(self) -> str:
-        """Get the logging level from environment variables with a default fallback."""
-        return os.getenv("LOG_LEVEL", "INFO").upper()  # Default to INFO level
-
-    @lru_cache(maxsize=1)
-    def get_sleep_interval(self) -> int:
-        """Get the sleep interval between trading cycles from environment variables with a default fallback."""
-        return int(os.getenv("SLEEP_INTERVAL", 60))  # Default to 60 seconds
+def _load() -> Config:
+    """Load environment variables from the .env file and build the configuration from them."""
+    load_dotenv()  # Load environment variables from .env file
+    _validate_required_keys()
+    return Config(
+        WALLET_PRIVATE_KEY=os.getenv("WALLET_PRIVATE_KEY"),
+        SLIPPAGE_TOLERANCE=float(os.getenv("SLIPPAGE_TOLERANCE", 0.005)),  # 0.5% default
+        PROFIT_THRESHOLD_NORMAL=float(os.getenv("PROFIT_THRESHOLD_NORMAL", 0.45)),  # 45% default
+        STOP_LOSS_PERCENTAGE=float(os.getenv("STOP_LOSS_PERCENTAGE", 0.10)),  # 10% default
+        INITIAL_INVESTMENT_USD=float(os.getenv("INITIAL_INVESTMENT_USD", 100)),  # USD default
+        DEXSCREENER_API_KEY=os.getenv("DEXSCREENER_API_KEY"),
+        JUPITER_API_URL=os.getenv("JUPITER_API_URL", "https://quote-api.jup.ag/v6"),  # Jupiter API default
+        SOLANA_RPC_URL=os.getenv("SOLANA_RPC_URL", "https://api.mainnet-beta.solana.com"),
+        LOG_LEVEL=os.getenv("LOG_LEVEL", "INFO").upper(),  # Default to INFO level
+        SLEEP_INTERVAL=int(os.getenv("SLEEP_INTERVAL", 60)),  # Default to 60 seconds
+    )
 
 
 # Usage
-config = Config()
+config = _load()
 
 # Example usage
 if __name__ == '__main__':
-    print(f"Wallet Private Key: {config.get_wallet_private_key()}")
-    print(f"Slippage Tolerance: {config.get_slippage_tolerance()}")
-    print(f"Profit Threshold: {config.get_profit_threshold_normal()}")
-    print(f"Stop-Loss Percentage: {config.get_stop_loss_percentage()}")
-    print(f"Initial Investment (USD): {config.get_initial_investment_usd()}")
-    print(f"DEX Screener API Key: {config.get_dexscreener_api_key()}")
-    print(f"Jupiter API URL: {config.get_jupiter_api_url()}")
-    print(f"Log Level: {config.get_log_level()}")
-    print(f"Sleep Interval: {config.get_sleep_interval()} seconds")
\ No newline at end of file
+    print(f"Wallet Private Key: {config.WALLET_PRIVATE_KEY}")
+    print(f"Slippage Tolerance: {config.SLIPPAGE_TOLERANCE}")
+    print(f"Profit Threshold: {config.PROFIT_THRESHOLD_NORMAL}")
+    print(f"Stop-Loss Percentage: {config.STOP_LOSS_PERCENTAGE}")
+    print(f"Initial Investment (USD): {config.INITIAL_INVESTMENT_USD}")
+    print(f"DEX Screener API Key: {config.DEXSCREENER_API_KEY}")
+    print(f"Jupiter API URL: {config.JUPITER_API_URL}")
+    print(f"Solana RPC URL: {config.SOLANA_RPC_URL}")
+    print(f"Log Level: {config.LOG_LEVEL}")
+    print(f"Sleep Interval: {config.SLEEP_INTERVAL} seconds")
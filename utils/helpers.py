@@ -1,68 +1,202 @@
 import asyncio
-from typing import Optional
-from datetime import datetime, timedelta
+import functools
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
 from functools import lru_cache
 
+from cachetools import TLRUCache, TTLCache
 from solana.publickey import PublicKey
 from solana.rpc.async_api import AsyncClient
 import aiohttp
 from ..logger import logger
 from ..config import config
 
+try:
+    from orjson import loads as json_loads
+except ImportError:  # orjson is optional; responses are then decoded with the stdlib parser
+    from json import loads as json_loads
 
+try:
+    from numba import njit
+except ImportError:  # Numba is optional; decorated kernels then run as plain Python
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+_http_session: Optional[aiohttp.ClientSession] = None
+_rpc_client: Optional[AsyncClient] = None
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Returns the process-wide HTTP session, creating it on first use.
+
+    All components share one keep-alive connection pool, so repeated calls to the same API
+    reuse open TCP/TLS connections instead of paying a new handshake per request.
+    Must be called from within a running event loop.
+    """
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=16,  # Stay polite to any single API while other hosts proceed
+            ttl_dns_cache=300,  # Skip DNS lookups for repeat hosts
+            keepalive_timeout=75,  # Keep idle connections open across trading-loop sleeps
+        )
+        timeout = aiohttp.ClientTimeout(total=10, connect=3)  # Default for every request; fail fast on dead hosts
+        _http_session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    return _http_session
+
+
+async def close_http_session() -> None:
+    """Closes the shared HTTP session."""
+    if _http_session and not _http_session.closed:
+        await _http_session.close()
+
+
+def get_rpc_client() -> AsyncClient:
+    """Returns the process-wide Solana RPC client, creating it on first use so its connection is reused."""
+    global _rpc_client
+    if _rpc_client is None:
+        _rpc_client = AsyncClient(config.SOLANA_RPC_URL)
+    return _rpc_client
+
+
+async def close_rpc_client() -> None:
+    """Closes the shared Solana RPC client."""
+    global _rpc_client
+    if _rpc_client is not None:
+        await _rpc_client.close()
+        _rpc_client = None
+
+
+def async_retry_with_backoff(retries: int = 3, backoff_in_seconds: float = 1, max_backoff: float = 300):
+    """
+    Decorator that retries an async function when it raises, with exponential backoff and jitter.
+
+    Args:
+        retries (int): Number of retries after the first failed attempt.
+        backoff_in_seconds (float): Base delay, doubled after every failed attempt.
+        max_backoff (float): Upper bound on the delay between attempts.
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            for attempt in range(retries + 1):
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    if attempt == retries:
+                        raise
+                    delay = min(backoff_in_seconds * 2 ** attempt, max_backoff) + random.random()
+                    logger.warning("%s failed: %s. Retrying in %.1fs (attempt %d/%d)", func.__name__, e, delay, attempt + 1, retries)
+                    await asyncio.sleep(delay)
+        return wrapper
+    return decorator
+
+
+class SingleFlightCache:
+    """
+    TTL cache for async loads in which concurrent misses on the same key share one load.
+
+    The first caller to miss starts the load and later callers await the same future instead of
+    hitting the API again. Empty results and exceptions are not cached, and a key's in-flight
+    entry is dropped as soon as its load finishes, so nothing grows with the number of keys seen.
+
+    Args:
+        maxsize (int): Maximum number of cached values.
+        ttl (float): Mean lifetime of a cached value in seconds.
+        jitter (float): Each value lives a random ttl ± jitter seconds, so refreshes spread out
+            instead of recurring in lockstep.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, jitter: float = 0.0):
+        if jitter:
+            self._cache = TLRUCache(maxsize=maxsize, ttu=lambda key, value, now: now + ttl + random.uniform(-jitter, jitter),
+                                    timer=time.monotonic)
+        else:
+            self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight: Dict[Hashable, asyncio.Future] = {}  # key -> load in progress
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Returns the cached value for key without loading it."""
+        return self._cache.get(key, default)
+
+    def update(self, values: Iterable[Tuple[Hashable, Any]]) -> None:
+        """Stores values loaded elsewhere, e.g. by a batched request."""
+        self._cache.update(values)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Returns the cached value for key, calling loader() if it is missing or has expired."""
+        value = self._cache.get(key)
+        if value:
+            return value
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._inflight[key] = asyncio.ensure_future(self._load(key, loader))
+        # Shielded so a cancelled caller doesn't cancel the load other callers are awaiting
+        return await asyncio.shield(future)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+            if value:
+                self._cache[key] = value
+            return value
+        finally:
+            del self._inflight[key]
+
+
+@lru_cache(maxsize=4096)
+def tweet_query(token_symbol: str, token_address: str) -> str:
+    """Returns the tweet search query for a token, built once per token."""
+    return f"{token_symbol} OR {token_address}"
+
+
+@lru_cache(maxsize=4096)
 def is_valid_solana_address(address: str) -> bool:
-    """Checks if the given address is a valid Solana public key."""
+    """Checks if the given address is a valid Solana public key. Results are memoized per address."""
     try:
         PublicKey(address)
         return True
     except Exception:
-        logger.warning(f"Invalid Solana address: {address}")
+        logger.warning("Invalid Solana address: %s", address)
         return False
 
 
-@lru_cache(maxsize=1)
+_sol_price_cache = SingleFlightCache(maxsize=1, ttl=60, jitter=15)
+
+
 async def get_solana_price_usd() -> Optional[float]:
-    """Fetches the current SOL price in USD from CoinGecko with caching and rate limiting."""
-    try:
-        async with aiohttp.ClientSession() as session:
+    """Fetches the current SOL price in USD from CoinGecko, cached for 45 to 75 seconds."""
+    async def load() -> Optional[float]:
+        try:
+            session = get_http_session()
             async with session.get("https://api.coingecko.com/api/v3/simple/price?ids=solana&vs_currencies=usd") as response:
                 response.raise_for_status()  # Raise error for bad responses
-                data = await response.json()
+                data = json_loads(await response.read())
                 return data["solana"]["usd"]
-    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-        logger.error(f"Error fetching SOL price: {e}")
-        return None
-
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error("Error fetching SOL price: %s", e)
+            return None
 
-async def check_enough_sol_balance(wallet_address: str, amount_needed: float) -> bool:
-    """Checks if the wallet has sufficient SOL balance."""
-    try:
-        async with AsyncClient("https://api.mainnet-beta.solana.com") as client:
-            balance_lamports = (await client.get_balance(wallet_address))["result"]["value"]
-            balance_sol = balance_lamports / 10**9  # Convert lamports to SOL
-            if balance_sol >= amount_needed:
-                return True
-            else:
-                logger.warning(f"Insufficient SOL: Needed {amount_needed}, Available {balance_sol}")
-                return False
-    except Exception as e:
-        logger.error(f"Error checking SOL balance for {wallet_address}: {e}")
-        return False
+    return await _sol_price_cache.get_or_load("solana", load)
 
 
 # Example usage
 async def main():
-    test_address = "So1111111111111111111111111111111111111112"  # System Program Address
+    test_address = "So11111111111111111111111111111111111111112"  # Wrapped SOL mint
     is_valid = is_valid_solana_address(test_address)
     print(f"Is {test_address} a valid Solana address? {is_valid}")
 
     sol_price = await get_solana_price_usd()
     print(f"Current SOL price: {sol_price}")
 
-    my_wallet_address = "YOUR_WALLET_ADDRESS_HERE"
-    amount_to_check = 0.1  # Example amount in SOL
-    has_enough = await check_enough_sol_balance(my_wallet_address, amount_to_check)
-    print(f"Enough SOL balance? {has_enough}")
+    await close_http_session()
 
 
 if __name__ == '__main__':
@@ -1,7 +1,20 @@
+import atexit
 import logging
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
-from typing import Optional, Union
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional, Union
+
+
+_listeners: Dict[str, QueueListener] = {}  # logger name -> listener writing its records to the real handlers
+
+
+@atexit.register
+def _stop_listeners() -> None:
+    """Flushes queued log records on interpreter exit."""
+    for listener in _listeners.values():
+        listener.stop()
+    _listeners.clear()
 
 
 def setup_logger(
@@ -16,6 +29,9 @@ def setup_logger(
     """
     Configures and returns a logger with flexible settings.
 
+    The logger itself only enqueues records; a background listener thread writes them to the
+    console and file handlers, so logging from the event loop never blocks on I/O.
+
     Args:
         name (str): Name of the logger. Defaults to the module name.
         level (Union[int, str]): Logging level (e.g., logging.INFO, "DEBUG"). Defaults to logging.INFO.
@@ -39,6 +55,9 @@ def setup_logger(
     # Remove existing handlers to avoid duplicate logs
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
+    listener = _listeners.pop(name, None)
+    if listener:
+        listener.stop()
 
     # Create a formatter
     formatter = logging.Formatter(format, datefmt=datefmt)
@@ -46,7 +65,7 @@ def setup_logger(
     # Add console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    handlers = [console_handler]
 
     # Add file handler if log_file is provided
     if log_file:
@@ -56,7 +75,13 @@ def setup_logger(
             backupCount=backup_count,
         )
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
+
+    # Route records through a queue to the handlers on the listener's thread
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue()
+    logger.addHandler(QueueHandler(log_queue))
+    listener = _listeners[name] = QueueListener(log_queue, *handlers)
+    listener.start()
 
     return logger
 